@@ -1,48 +1,146 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-import uuid
-import asyncio
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from typing import List
+
+# Shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_store import get_store
+from providers import match as match_provider, source_key, title_for
+from records import enrich, is_posted, mark_posted
+from ids import new_video_id
+from httpcache import CACHE_CONTROL, cache_headers, is_not_modified
+from video_lookup import get_all_videos, get_video_info, get_video_json  # re-exported for existing callers
+from compression import encode, iter_compressed, negotiate
+from listing import NDJSON_TYPE, iter_ndjson, iter_object, listing_etag, page_body, parse_limit, wants_ndjson
+from links import announce, extract_urls, is_valid_url
 
 # Environment variables
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 CHANNEL_ID = os.environ.get('CHANNEL_ID')
 WEBAPP_BASE_URL = os.environ.get('WEBAPP_BASE_URL', 'https://your-app.vercel.app')
+WEBHOOK_REPLY_INLINE = os.environ.get('WEBHOOK_REPLY_INLINE', '0') == '1'  # answer the user in the webhook response
+WEBHOOK_FAST_ACK = os.environ.get('WEBHOOK_FAST_ACK', '0') == '1'  # acknowledge first, process in the background
+UPDATE_QUEUE_SIZE = int(os.environ.get('UPDATE_QUEUE_SIZE', '100'))
+UPDATE_WORKERS = int(os.environ.get('UPDATE_WORKERS', '4'))
+
+# Shared video storage (backend configured through VIDEO_STORE_BACKEND / VIDEO_STORE_PATH)
+VIDEOS_STORE = get_store()
+
+# Bot runtime and fast-ack queue, created on the first POST so that read-only
+# requests never import asyncio, httpx or the Telegram stack
+_bot_runtime = None
+_update_queue = None
+_runtime_lock = threading.Lock()
+
+def get_bot_runtime():
+    """Get the bot and event loop shared by every update handled by this instance"""
+    global _bot_runtime
+    if _bot_runtime is None:
+        with _runtime_lock:
+            if _bot_runtime is None:
+                from bot_runtime import create_runtime
+                _bot_runtime = create_runtime(BOT_TOKEN)
+    return _bot_runtime
 
-# Global video storage
-VIDEOS_STORE = {}
+def get_update_queue():
+    """Get the background queue for fast-ack mode; the queue bound is the backpressure"""
+    global _update_queue
+    if not WEBHOOK_FAST_ACK:
+        return None
+    runtime = get_bot_runtime()
+    if _update_queue is None:
+        with _runtime_lock:
+            if _update_queue is None:
+                from resilience import REQUEST_BUDGET
+                from work_queue import create_work_queue
+                _update_queue = create_work_queue(
+                    runtime, maxsize=UPDATE_QUEUE_SIZE, workers=UPDATE_WORKERS, timeout=REQUEST_BUDGET
+                )
+    return _update_queue
 
 class VideoProcessor:
     @staticmethod
     def is_valid_url(url: str) -> bool:
-        return url.startswith(('http://', 'https://')) and '.' in url
+        return is_valid_url(url)
     
     @staticmethod
     def extract_video_title(video_url: str) -> str:
-        if 'youtube.com' in video_url or 'youtu.be' in video_url:
-            return "YouTube Video"
-        elif 'vimeo.com' in video_url:
-            return "Vimeo Video"
-        elif 'tiktok.com' in video_url:
-            return "TikTok Video"
-        elif 'instagram.com' in video_url:
-            return "Instagram Video"
-        else:
-            return "Video Content"
+        return title_for(match_provider(video_url))
+    
+    @staticmethod
+    def save_video(video_id: str, video_url: str, username: str = "Unknown") -> dict:
+        return VideoProcessor.save_videos([video_id], [video_url], username)[0]
     
     @staticmethod
-    def save_video(video_id: str, video_url: str, username: str = "Unknown"):
-        VIDEOS_STORE[video_id] = {
-            "id": video_id,
-            "url": video_url,
-            "added_by": username,
-            "title": VideoProcessor.extract_video_title(video_url)
-        }
+    def save_videos(video_ids: List[str], video_urls: List[str], username: str = "Unknown") -> List[dict]:
+        """Save several videos in one store write; returns the stored record for each URL"""
+        created_at = int(time.time())
+        records = []
+        for video_id, video_url in zip(video_ids, video_urls):
+            found = match_provider(video_url)
+            record = {
+                "id": video_id,
+                "url": video_url,
+                "added_by": username,
+                "title": title_for(found),
+                "created_at": created_at,
+                "source_key": source_key(video_url, found),
+                "posted": False
+            }
+            # Render the watch page fragments once, at ingest
+            records.append(enrich(record, found))
+        return VIDEOS_STORE.add_videos(records)
+    
+    @staticmethod
+    def mark_posted(records: List[dict], message):
+        """Note that the channel post announcing these videos was delivered"""
+        VIDEOS_STORE.save_many([mark_posted(record, getattr(message, 'message_id', None)) for record in records])
+
+def webhook_reply(chat_id, text: str, **kwargs) -> dict:
+    """Build a sendMessage call to return in the webhook response body"""
+    return {"method": "sendMessage", "chat_id": chat_id, "text": text, **kwargs}
 
-async def process_message(bot, message):
-    """Process incoming message"""
+async def process_message(bot, message, reply_inline: bool = False, deadline=None):
+    """Process incoming message
+    
+    With reply_inline, the reply to the user is not sent but returned as a
+    Bot API call for the webhook response body; only the channel post goes
+    out over HTTP.
+    
+    Bot API calls are retried on transient errors within the deadline (by
+    default REQUEST_BUDGET from now). When the API is down, CircuitOpenError
+    or DeadlineExceeded is raised instead of an error reply being attempted.
+    """
+    # Imported here so read-only requests never load the Telegram stack
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    import asyncio
+    from outbound import PRIORITY_CHANNEL, PRIORITY_REPLY, send, send_concurrently
+    from resilience import CircuitOpenError, Deadline, DeadlineExceeded, check_available, resilient
+    
+    chat_id = None
+    deadline = deadline or Deadline()
+    
+    async def send_message(target, priority: int = PRIORITY_REPLY, **kwargs):
+        """sendMessage through the flood-limit scheduler, with the wait in the queue counted against the deadline"""
+        check_available('sendMessage', deadline)
+        call = resilient('sendMessage', lambda: bot.send_message(chat_id=target, **kwargs), deadline)
+        try:
+            return await asyncio.wait_for(send(target, call, priority), deadline.remaining())
+        except asyncio.TimeoutError:
+            if deadline.expired:
+                raise DeadlineExceeded("No time left for sendMessage") from None
+            raise
+    
+    async def reply(text: str, **kwargs):
+        if reply_inline:
+            return webhook_reply(chat_id, text, **kwargs)
+        await send_message(chat_id, text=text, **kwargs)
+    
     try:
         text = message.get('text', '').strip()
         user = message.get('from', {})
@@ -59,8 +157,7 @@ async def process_message(bot, message):
                 "• Provide a watch button for users\n\n"
                 "Just send me any video URL to get started!"
             )
-            await bot.send_message(chat_id=chat_id, text=welcome_message)
-            return
+            return await reply(welcome_message)
         
         elif text == '/help':
             help_message = (
@@ -75,56 +172,155 @@ async def process_message(bot, message):
                 "• Instagram URLs\n"
                 "• Direct video file URLs"
             )
-            await bot.send_message(chat_id=chat_id, text=help_message)
-            return
+            return await reply(help_message)
         
-        # Process video URL
-        if not VideoProcessor.is_valid_url(text):
-            await bot.send_message(
-                chat_id=chat_id, 
-                text="❌ Please send a valid video URL.\nExample: https://www.youtube.com/watch?v=VIDEO_ID"
+        # Every URL in the message; entity offsets index the unstripped text
+        urls = extract_urls(message.get('text', ''), message.get('entities'))
+        if not urls:
+            return await reply("❌ Please send a valid video URL.\nExample: https://www.youtube.com/watch?v=VIDEO_ID")
+        
+        if len(urls) > 1:
+            # One store write, one channel post per keyboard's worth of videos and one summary reply
+            video_ids = [new_video_id() for _ in urls]
+            stored = VideoProcessor.save_videos(video_ids, urls, username)
+            
+            def post(text: str, rows):
+                return send_message(
+                    CHANNEL_ID, PRIORITY_CHANNEL,
+                    text=text,
+                    reply_markup=InlineKeyboardMarkup([
+                        [InlineKeyboardButton(label, url=url) for label, url in row] for row in rows
+                    ])
+                )
+            
+            # Inline replies go out with the webhook response, after the posts
+            summary = await announce(
+                stored, video_ids, WEBAPP_BASE_URL, post, VideoProcessor.mark_posted,
+                None if reply_inline else lambda text: reply(text, parse_mode='Markdown')
             )
+            if reply_inline:
+                return await reply(summary, parse_mode='Markdown')
             return
         
-        # Generate video ID and save
-        video_id = str(uuid.uuid4())
-        VideoProcessor.save_video(video_id, text, username)
+        # Generate video ID and save; a resubmitted video keeps its original record
+        video_url = urls[0]
+        video_id = new_video_id()
+        video_info = VideoProcessor.save_video(video_id, video_url, username)
+        if video_info['id'] != video_id and is_posted(video_info):
+            return await reply(
+                f"ℹ️ This video was already added!\n\n🆔 Video ID: `{video_info['id']}`\n🌐 Watch URL: {WEBAPP_BASE_URL}/watch/{video_info['id']}",
+                parse_mode='Markdown'
+            )
+        
+        # A resubmitted video whose channel post never went out is posted now
+        video_id = video_info['id']
         
         # Create webapp URL
         webapp_url = f"{WEBAPP_BASE_URL}/watch/{video_id}"
-        video_title = VideoProcessor.extract_video_title(text)
+        video_title = video_info['title']
         
         # Create channel post
         post_message = f"🎬 New Video Available!\n\n📺 {video_title}\n\nClick the button below to watch:"
         keyboard = InlineKeyboardMarkup([[
             InlineKeyboardButton("🎥 Watch Video", url=webapp_url)
         ]])
-        
-        # Send to channel
-        await bot.send_message(
-            chat_id=CHANNEL_ID,
+        channel_post = send_message(
+            CHANNEL_ID, PRIORITY_CHANNEL,
             text=post_message,
             reply_markup=keyboard
         )
+        confirmation = f"✅ Video added successfully!\n\n🆔 Video ID: `{video_id}`\n🔗 Original URL: {video_url}\n🌐 Watch URL: {webapp_url}\n\nIt is being posted to the channel now."
         
-        # Confirm to user
-        await bot.send_message(
-            chat_id=chat_id,
-            text=f"✅ Video added successfully!\n\n🆔 Video ID: `{video_id}`\n🔗 Original URL: {text}\n🌐 Watch URL: {webapp_url}\n\nThe post has been created in the channel!",
-            parse_mode='Markdown'
+        if reply_inline:
+            VideoProcessor.mark_posted([video_info], await channel_post)
+            return await reply(confirmation, parse_mode='Markdown')
+        
+        # Post to the channel and confirm to the user at the same time
+        channel_result, _ = await send_concurrently(
+            channel_post,
+            reply(confirmation, parse_mode='Markdown')
         )
         
+        # A failed confirmation is only logged; a failed channel post is reported to the user
+        if isinstance(channel_result, Exception):
+            raise channel_result
+        VideoProcessor.mark_posted([video_info], channel_result)
+        
+    except (CircuitOpenError, DeadlineExceeded):
+        # An error reply would fail the same way; let the caller answer fast
+        raise
     except Exception as e:
         print(f"Error processing message: {e}")
         try:
-            await bot.send_message(
-                chat_id=chat_id,
-                text="❌ An error occurred while processing your message. Please try again."
-            )
+            return await reply("❌ An error occurred while processing your message. Please try again.")
         except:
             pass
 
+def release_update(update_id):
+    """Let Telegram's retry of a failed update through the dedup index"""
+    if update_id is not None:
+        try:
+            VIDEOS_STORE.release_update(update_id)
+        except Exception as e:
+            print(f"Error releasing update {update_id}: {e}")
+
 class handler(BaseHTTPRequestHandler):
+    def send_not_modified(self, policy: str, etag: str, last_modified=None) -> bool:
+        """Answer a matching conditional GET with 304; False when a full response is needed"""
+        if not is_not_modified(self.headers, etag, last_modified):
+            return False
+        self.send_response(304)
+        for name, value in cache_headers(policy, etag, last_modified):
+            self.send_header(name, value)
+        self.end_headers()
+        return True
+    
+    def send_json(self, body: bytes, policy: str, etag=None, last_modified=None):
+        """Send a cacheable JSON body, compressed when the client accepts it"""
+        body, content_encoding = encode(body, negotiate(self.headers.get('Accept-Encoding')))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in cache_headers(policy, etag, last_modified):
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_stream(self, chunks, content_type: str, policy: str, etag=None):
+        """Stream a body chunk by chunk; its end is marked by closing the connection"""
+        content_encoding = negotiate(self.headers.get('Accept-Encoding'))
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Connection', 'close')
+        for name, value in cache_headers(policy, etag):
+            self.send_header(name, value)
+        self.end_headers()
+        for chunk in iter_compressed(chunks, content_encoding):
+            self.wfile.write(chunk)
+    
+    def send_video_list(self, query: dict):
+        """/api/videos: a cursor page with ?limit/?after, NDJSON, or the full listing streamed"""
+        after = query.get('after', [None])[0]
+        if wants_ndjson(query.get('format', [None])[0], self.headers.get('Accept')):
+            etag = listing_etag(VIDEOS_STORE, 'ndjson', after)
+            if not self.send_not_modified('listing', etag):
+                self.send_stream(iter_ndjson(VIDEOS_STORE, after), NDJSON_TYPE, 'listing', etag)
+        elif 'limit' in query or after is not None:
+            limit = parse_limit(query.get('limit', [None])[0])
+            etag = listing_etag(VIDEOS_STORE, 'page', after, limit)
+            if not self.send_not_modified('listing', etag):
+                self.send_json(page_body(VIDEOS_STORE, after, limit), 'listing', etag)
+        else:
+            etag = listing_etag(VIDEOS_STORE)
+            if not self.send_not_modified('listing', etag):
+                self.send_stream(iter_object(VIDEOS_STORE), 'application/json', 'listing', etag)
+    
     def do_GET(self):
         """Handle GET requests"""
         try:
@@ -132,32 +328,40 @@ class handler(BaseHTTPRequestHandler):
                 # Health check
                 self.send_response(200)
                 self.send_header('Content-Type', 'application/json')
+                self.send_header('Cache-Control', CACHE_CONTROL['private'])
                 self.end_headers()
                 response = {"status": "Bot webhook is running", "path": self.path}
+                if _update_queue is not None:
+                    response["queue"] = _update_queue.metrics()
+                if _bot_runtime is not None:
+                    # Only loaded once a POST has used the scheduler
+                    from outbound import outbound_stats
+                    from resilience import breaker_stats
+                    from transport import transport_stats
+                    response["outbound"] = outbound_stats()
+                    response["circuits"] = breaker_stats()
+                    response["transport"] = transport_stats()
                 self.wfile.write(json.dumps(response).encode())
                 
             elif self.path.startswith('/api/video/'):
                 # Get specific video
                 video_id = self.path.split('/')[-1]
-                video_info = VIDEOS_STORE.get(video_id)
+                entry = get_video_json(video_id)
                 
-                if video_info:
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(video_info).encode())
+                if entry:
+                    body, etag, last_modified = entry
+                    if not self.send_not_modified('video', etag, last_modified):
+                        self.send_json(body, 'video', etag, last_modified)
                 else:
                     self.send_response(404)
                     self.send_header('Content-Type', 'application/json')
+                    self.send_header('Cache-Control', CACHE_CONTROL['missing'])
                     self.end_headers()
                     self.wfile.write(json.dumps({"error": "Video not found"}).encode())
                     
-            elif self.path == '/api/videos':
-                # Get all videos
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(VIDEOS_STORE).encode())
+            elif urlparse(self.path).path == '/api/videos':
+                # List videos
+                self.send_video_list(parse_qs(urlparse(self.path).query))
                 
             else:
                 self.send_response(404)
@@ -203,32 +407,67 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             message = update_data['message']
+            update_id = update_data.get('update_id')
+            
+            # Telegram redelivers updates it thinks failed; handle each update_id once
+            if update_id is not None and not VIDEOS_STORE.claim_update(update_id):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps({"status": "ok - duplicate"}).encode())
+                return
             
-            # Create bot instance and process message
-            bot = Bot(token=BOT_TOKEN)
+            update_queue = get_update_queue()
+            if update_queue is not None:
+                # Acknowledge right away; a full queue asks Telegram to retry later
+                if update_queue.submit(lambda bot: process_message(bot, message)):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.end_headers()
+                    self.wfile.write(json.dumps({"status": "queued"}).encode())
+                else:
+                    release_update(update_id)
+                    self.send_response(503)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Retry-After', '1')
+                    self.end_headers()
+                    self.wfile.write(json.dumps({"error": "Update queue is full"}).encode())
+                return
             
-            # Process message asynchronously
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            from concurrent.futures import TimeoutError as RunTimeout
+            from resilience import CircuitOpenError, Deadline, DeadlineExceeded, retry_after
             
+            # The whole update, bot start-up included, has to fit in the function's budget
+            deadline = Deadline()
             try:
-                loop.run_until_complete(process_message(bot, message))
+                inline_reply = get_bot_runtime().run(
+                    lambda bot: process_message(bot, message, reply_inline=WEBHOOK_REPLY_INLINE, deadline=deadline),
+                    timeout=deadline.remaining()
+                )
                 
                 self.send_response(200)
                 self.send_header('Content-Type', 'application/json')
                 self.end_headers()
-                self.wfile.write(json.dumps({"status": "ok"}).encode())
+                self.wfile.write(json.dumps(inline_reply or {"status": "ok"}).encode())
+                
+            except (CircuitOpenError, DeadlineExceeded, RunTimeout) as e:
+                # Telegram is unreachable: answer now instead of holding the function open
+                print(f"Telegram unavailable: {e!r}")
+                release_update(update_id)
+                self.send_response(503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Retry-After', str(retry_after()))
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": "Telegram API unavailable"}).encode())
                 
             except Exception as e:
                 print(f"Message processing error: {e}")
+                release_update(update_id)
                 self.send_response(500)
                 self.send_header('Content-Type', 'application/json')
                 self.end_headers()
                 self.wfile.write(json.dumps({"error": f"Processing error: {str(e)}"}).encode())
                 
-            finally:
-                loop.close()
-                
         except json.JSONDecodeError:
             self.send_response(400)
             self.send_header('Content-Type', 'application/json')
@@ -241,12 +480,3 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             self.wfile.write(json.dumps({"error": str(e)}).encode())
-
-# Export video functions for the web app
-def get_video_info(video_id: str):
-    """Get video information by ID"""
-    return VIDEOS_STORE.get(video_id)
-
-def get_all_videos():
-    """Get all videos"""
-    return VIDEOS_STORE
@@ -1,7 +1,16 @@
-from flask import Flask, render_template_string, jsonify, request
-import re
+from flask import Flask, Response, jsonify, request
 import os
-from main import get_video_info, get_all_videos
+from video_lookup import get_video_info, get_video_json
+from cache import PageCache
+from providers import embed_html
+from records import ensure_enriched
+from templates import (
+    HOME_ETAG, HOME_PAGE_VARIANTS, TEMPLATE_VERSION, VIDEO_NOT_FOUND_VARIANTS, render_watch_page, watch_page_etag
+)
+from httpcache import cache_headers, is_not_modified
+from compression import encode, iter_compressed, negotiate, precompress, select
+from listing import NDJSON_TYPE, iter_ndjson, iter_object, listing_etag, page_body, parse_limit, wants_ndjson
+from video_store import get_reader
 
 app = Flask(__name__)
 
@@ -9,273 +18,62 @@ class VideoEmbedder:
     @staticmethod
     def get_embed_code(video_url: str, video_title: str = "Video") -> str:
         """Generate embed code based on video URL"""
-        
-        # YouTube
-        youtube_patterns = [
-            r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([a-zA-Z0-9_-]+)',
-            r'youtube\.com/watch\?.*v=([a-zA-Z0-9_-]+)'
-        ]
-        
-        for pattern in youtube_patterns:
-            match = re.search(pattern, video_url)
-            if match:
-                video_id = match.group(1)
-                return f'''
-                <div class="video-container">
-                    <iframe width="100%" height="500" 
-                            src="https://www.youtube.com/embed/{video_id}?autoplay=1" 
-                            frameborder="0" 
-                            allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" 
-                            allowfullscreen>
-                    </iframe>
-                </div>'''
-        
-        # Vimeo
-        vimeo_match = re.search(r'vimeo\.com/(\d+)', video_url)
-        if vimeo_match:
-            video_id = vimeo_match.group(1)
-            return f'''
-            <div class="video-container">
-                <iframe width="100%" height="500" 
-                        src="https://player.vimeo.com/video/{video_id}?autoplay=1" 
-                        frameborder="0" 
-                        allow="autoplay; fullscreen; picture-in-picture" 
-                        allowfullscreen>
-                </iframe>
-            </div>'''
-        
-        # TikTok
-        tiktok_match = re.search(r'tiktok\.com/.*/video/(\d+)', video_url)
-        if tiktok_match:
-            return f'''
-            <div class="video-container">
-                <iframe width="100%" height="500" 
-                        src="https://www.tiktok.com/embed/v2/{tiktok_match.group(1)}" 
-                        frameborder="0" 
-                        allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" 
-                        allowfullscreen>
-                </iframe>
-            </div>'''
-        
-        # Instagram
-        if 'instagram.com' in video_url:
-            return f'''
-            <div class="video-container">
-                <div class="fallback-message">
-                    <h3>{video_title}</h3>
-                    <p>Click the link below to watch on Instagram:</p>
-                    <a href="{video_url}" target="_blank" class="video-link">Watch on Instagram</a>
-                </div>
-            </div>'''
-        
-        # Direct video files
-        video_extensions = ['.mp4', '.webm', '.ogg', '.mov', '.avi']
-        if any(ext in video_url.lower() for ext in video_extensions):
-            return f'''
-            <div class="video-container">
-                <video width="100%" height="500" controls autoplay>
-                    <source src="{video_url}" type="video/mp4">
-                    Your browser does not support the video tag.
-                </video>
-            </div>'''
-        
-        # Fallback for other URLs
-        return f'''
-        <div class="video-container">
-            <div class="fallback-message">
-                <h3>{video_title}</h3>
-                <p>Click the link below to watch the video:</p>
-                <a href="{video_url}" target="_blank" class="video-link">Open Video</a>
-            </div>
-        </div>'''
-
-# HTML Templates as strings
-BASE_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ title }}</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            color: #333;
-        }
-
-        .header {
-            background: rgba(255, 255, 255, 0.1);
-            backdrop-filter: blur(10px);
-            padding: 1rem 0;
-            border-bottom: 1px solid rgba(255, 255, 255, 0.2);
-        }
-
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-
-        .header h1 {
-            color: white;
-            text-align: center;
-            font-size: 2rem;
-            margin-bottom: 0.5rem;
-        }
-
-        .header p {
-            color: rgba(255, 255, 255, 0.8);
-            text-align: center;
-        }
-
-        .main-content {
-            padding: 2rem 0;
-        }
-
-        .video-container {
-            background: white;
-            border-radius: 15px;
-            overflow: hidden;
-            box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-            margin: 2rem auto;
-            max-width: 800px;
-        }
-
-        .video-container iframe,
-        .video-container video {
-            width: 100%;
-            height: 450px;
-            border: none;
-        }
-
-        .video-info {
-            padding: 1.5rem;
-            background: white;
-            border-radius: 15px;
-            margin: 1rem auto;
-            max-width: 800px;
-            box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
-        }
-
-        .video-info h2 {
-            color: #333;
-            margin-bottom: 1rem;
-            font-size: 1.5rem;
-        }
-
-        .video-meta {
-            display: flex;
-            gap: 2rem;
-            margin-top: 1rem;
-            font-size: 0.9rem;
-            color: #666;
-        }
-
-        .fallback-message {
-            padding: 3rem;
-            text-align: center;
-            background: #f8f9fa;
-        }
-
-        .video-link {
-            display: inline-block;
-            background: #667eea;
-            color: white;
-            padding: 12px 24px;
-            text-decoration: none;
-            border-radius: 25px;
-            margin-top: 1rem;
-            transition: background 0.3s ease;
-        }
-
-        .video-link:hover {
-            background: #5a67d8;
-        }
-
-        .error-container, .home-content {
-            background: white;
-            border-radius: 15px;
-            padding: 3rem;
-            text-align: center;
-            margin: 2rem auto;
-            max-width: 600px;
-            box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
-        }
-
-        .error-container h2 {
-            color: #e53e3e;
-            margin-bottom: 1rem;
-        }
-
-        .home-content h2 {
-            color: #333;
-            margin-bottom: 1rem;
-        }
-
-        .home-content p {
-            color: #666;
-            line-height: 1.6;
-            margin-bottom: 1rem;
-        }
-
-        @media (max-width: 768px) {
-            .container {
-                padding: 0 15px;
-            }
-            
-            .header h1 {
-                font-size: 1.5rem;
-            }
-            
-            .video-container iframe,
-            .video-container video {
-                height: 250px;
-            }
-            
-            .video-meta {
-                flex-direction: column;
-                gap: 0.5rem;
-            }
-        }
-    </style>
-</head>
-<body>
-    <header class="header">
-        <div class="container">
-            <h1>🎬 Video Hosting Platform</h1>
-            <p>Your personal video streaming service</p>
-        </div>
-    </header>
-
-    <main class="main-content">
-        <div class="container">
-            {{ content }}
-        </div>
-    </main>
-</body>
-</html>
-'''
+        return embed_html(video_url, video_title)
+
+# Rendered watch pages; records never change, so entries only expire with the template
+PAGE_CACHE = PageCache(max_bytes=int(os.environ.get('PAGE_CACHE_BYTES', str(32 * 1024 * 1024))))
+
+def cache_watch_page(record: dict):
+    """Write-through: render the page when the bot saves or changes a record"""
+    PAGE_CACHE.set(record['id'], TEMPLATE_VERSION, precompress(render_watch_page(ensure_enriched(record))))
+
+# Only the writing process sees saves; read-only stores get no write-through
+if not get_reader().readonly:
+    get_reader().add_listener(cache_watch_page)
+
+def with_cache_headers(response: Response, policy: str, etag=None, last_modified=None) -> Response:
+    """Add Cache-Control and validators to a response"""
+    for name, value in cache_headers(policy, etag, last_modified):
+        response.headers[name] = value
+    return response
+
+def accepted_encoding():
+    return negotiate(request.headers.get('Accept-Encoding'))
+
+def compressed_response(body: bytes, content_encoding=None, status: int = 200,
+                        mimetype: str = 'text/html') -> Response:
+    """Response for an already encoded body"""
+    response = Response(body, status=status, mimetype=mimetype)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def page_response(variants: dict, status: int = 200) -> Response:
+    """Serve the stored variant of a precompressed page"""
+    return compressed_response(*select(variants, accepted_encoding()), status=status)
+
+def json_response(body: bytes) -> Response:
+    """Compress a serialized JSON body for the client"""
+    return compressed_response(*encode(body, accepted_encoding()), mimetype='application/json')
+
+def stream_response(chunks, mimetype: str) -> Response:
+    """Stream a generated body; the server sends it with chunked transfer encoding"""
+    content_encoding = accepted_encoding()
+    return compressed_response(iter_compressed(chunks, content_encoding), content_encoding, mimetype=mimetype)
+
+def not_modified(policy: str, etag: str, last_modified=None):
+    """A 304 response when the request's validators still match, otherwise None"""
+    if is_not_modified(request.headers, etag, last_modified):
+        return with_cache_headers(Response(status=304), policy, etag, last_modified)
+    return None
 
 @app.route('/')
 def index():
     """Homepage"""
-    content = '''
-    <div class="home-content">
-        <h2>Welcome to Our Video Platform</h2>
-        <p>This platform hosts videos shared through our Telegram bot. Each video gets its own unique viewing page with embedded player support for various video platforms.</p>
-        <p>To add videos, use our Telegram bot by sending video URLs directly to the bot.</p>
-        <p><strong>Supported platforms:</strong> YouTube, Vimeo, TikTok, Instagram, Direct video files, and more!</p>
-    </div>
-    '''
-    return render_template_string(BASE_TEMPLATE, title="Home - Video Hosting Platform", content=content)
+    return not_modified('static', HOME_ETAG) or with_cache_headers(
+        page_response(HOME_PAGE_VARIANTS), 'static', HOME_ETAG
+    )
 
 @app.route('/watch/<video_id>')
 def watch_video(video_id):
@@ -283,47 +81,54 @@ def watch_video(video_id):
     video_info = get_video_info(video_id)
     
     if not video_info:
-        content = '''
-        <div class="error-container">
-            <h2>❌ Video Not Found</h2>
-            <p>The video you're looking for doesn't exist or may have been removed.</p>
-            <a href="/" class="video-link">← Back to Home</a>
-        </div>
-        '''
-        return render_template_string(BASE_TEMPLATE, title="Video Not Found", content=content), 404
+        return with_cache_headers(page_response(VIDEO_NOT_FOUND_VARIANTS, status=404), 'missing')
     
-    # Generate embed code
-    embed_code = VideoEmbedder.get_embed_code(video_info['url'], video_info.get('title', 'Video'))
+    # Revalidations are answered without rendering anything
+    etag = watch_page_etag(video_info)
+    last_modified = video_info.get('created_at')
+    cached = not_modified('video', etag, last_modified)
+    if cached is not None:
+        return cached
     
-    content = f'''
-    {embed_code}
-    <div class="video-info">
-        <h2>{video_info.get('title', 'Video Information')}</h2>
-        <div class="video-meta">
-            <div><strong>Added by:</strong> {video_info['added_by']}</div>
-            <div><strong>Video ID:</strong> {video_info['id']}</div>
-            <div><strong>Original URL:</strong> <a href="{video_info['url']}" target="_blank">{video_info['url'][:50]}{'...' if len(video_info['url']) > 50 else ''}</a></div>
-        </div>
-    </div>
-    '''
-    
-    return render_template_string(BASE_TEMPLATE, title=f"{video_info.get('title', 'Video')} - Video Platform", content=content)
+    variants = PAGE_CACHE.get(video_id, TEMPLATE_VERSION)
+    if variants is None:
+        variants = precompress(render_watch_page(video_info))
+        PAGE_CACHE.set(video_id, TEMPLATE_VERSION, variants)
+    return with_cache_headers(page_response(variants), 'video', etag, last_modified)
 
 @app.route('/api/video/<video_id>')
 def api_get_video(video_id):
     """API endpoint to get video information"""
-    video_info = get_video_info(video_id)
+    entry = get_video_json(video_id)
     
-    if not video_info:
-        return jsonify({'error': 'Video not found'}), 404
+    if not entry:
+        return with_cache_headers(jsonify({'error': 'Video not found'}), 'missing'), 404
     
-    return jsonify(video_info)
+    body, etag, last_modified = entry
+    return not_modified('video', etag, last_modified) or with_cache_headers(
+        json_response(body), 'video', etag, last_modified
+    )
 
 @app.route('/api/videos')
 def api_list_videos():
-    """API endpoint to list all videos"""
-    videos = get_all_videos()
-    return jsonify(videos)
+    """API endpoint to list videos: a cursor page with ?limit/?after, NDJSON, or everything streamed"""
+    store = get_reader()
+    after = request.args.get('after')
+    if wants_ndjson(request.args.get('format'), request.headers.get('Accept')):
+        etag = listing_etag(store, 'ndjson', after)
+        return not_modified('listing', etag) or with_cache_headers(
+            stream_response(iter_ndjson(store, after), NDJSON_TYPE), 'listing', etag
+        )
+    if 'limit' in request.args or after is not None:
+        limit = parse_limit(request.args.get('limit'))
+        etag = listing_etag(store, 'page', after, limit)
+        return not_modified('listing', etag) or with_cache_headers(
+            json_response(page_body(store, after, limit)), 'listing', etag
+        )
+    etag = listing_etag(store)
+    return not_modified('listing', etag) or with_cache_headers(
+        stream_response(iter_object(store), 'application/json'), 'listing', etag
+    )
 
 # For Vercel
 app.debug = False
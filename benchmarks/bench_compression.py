@@ -0,0 +1,64 @@
+"""Compression ratio and CPU cost per encoding for a watch page and a JSON listing
+
+Usage: python benchmarks/bench_compression.py [records]
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import compression
+import templates
+from records import enrich
+
+def watch_page() -> bytes:
+    return templates.render_watch_page(enrich({
+        "id": "0f8fad5b-d9cb-469f-a165-70867728950e",
+        "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "added_by": "curator",
+        "title": "YouTube Video",
+        "created_at": 1700000000
+    }))
+
+def listing(size: int) -> bytes:
+    """The /api/videos body: public fields only, as the stores serve them"""
+    videos = {}
+    for n in range(size):
+        record = {
+            "id": f"{n:08x}-d9cb-469f-a165-70867728950e",
+            "url": f"https://www.youtube.com/watch?v=vid{n:08d}",
+            "added_by": f"user{n % 50}",
+            "title": "YouTube Video",
+            "created_at": 1700000000 + n
+        }
+        videos[record['id']] = record
+    return json.dumps(videos).encode()
+
+def encoders():
+    for level in (1, 6, 9):
+        yield f"gzip -{level}", lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0)
+    if compression.brotli is not None:
+        for quality in (4, 5, 11):
+            yield f"brotli q{quality}", lambda body, quality=quality: compression.brotli.compress(body, quality=quality)
+    else:
+        print("(brotli not installed, skipping)")
+
+def measure(name: str, body: bytes):
+    print(f"{name}: {len(body):,} bytes")
+    for label, encoder in encoders():
+        runs = max(1, 2_000_000 // len(body))
+        start = time.perf_counter()
+        for _ in range(runs):
+            encoded = encoder(body)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"  {label:<12} {len(encoded):>10,} bytes  ratio {len(body) / len(encoded):6.2f}  {elapsed * 1e6:10.0f} µs")
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    measure("watch page", watch_page())
+    measure(f"listing of {size} videos", listing(size))
+
+if __name__ == '__main__':
+    main()
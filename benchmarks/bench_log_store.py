@@ -0,0 +1,56 @@
+"""Cold open and lookup latency of the log store against SQLite
+
+Usage: python benchmarks/bench_log_store.py [records]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ids import ShortIdGenerator
+from video_store import open_store
+
+def make_records(size: int) -> list:
+    new_id = ShortIdGenerator(node=1)
+    return [{
+        "id": new_id(),
+        "url": f"https://www.youtube.com/watch?v={n:011d}",
+        "added_by": f"user{n % 1000}",
+        "title": "YouTube Video",
+        "created_at": 1700000000 + n,
+        "source_key": f"youtube:{n:011d}"
+    } for n in range(size)]
+
+def measure(backend: str, path: str, records: list):
+    store = open_store(backend, path)
+    for start in range(0, len(records), 1000):
+        store.save_many(records[start:start + 1000])
+    store.close()
+
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    opened = time.perf_counter() - start
+
+    ids = [record['id'] for record in random.Random(1).sample(records, min(10_000, len(records)))]
+    start = time.perf_counter()
+    for video_id in ids:
+        store.get_json(video_id)
+    lookup = (time.perf_counter() - start) / len(ids)
+    store.close()
+    print(f"{backend:<8} open {opened * 1e3:8.2f} ms   get_json {lookup * 1e6:7.1f} µs")
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    records = make_records(size)
+    directory = tempfile.mkdtemp()
+    try:
+        measure('sqlite', os.path.join(directory, 'videos.db'), records)
+        measure('log', os.path.join(directory, 'log'), records)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
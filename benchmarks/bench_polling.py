@@ -0,0 +1,54 @@
+"""Throughput of the long-polling runner against the fake Bot API
+
+Queues updates from several chats, half of them new video URLs, and runs the
+poller until every update is handled. Flood limits are lifted, since the fake
+server has none.
+
+Usage: python benchmarks/bench_polling.py [updates] [chats] [concurrency]
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORY = tempfile.mkdtemp()
+os.environ.update(
+    BOT_TOKEN='123456:FAKE', CHANNEL_ID='-1001',
+    VIDEO_STORE_PATH=os.path.join(DIRECTORY, 'videos.db'),
+    TELEGRAM_GLOBAL_RATE='1000000', TELEGRAM_CHAT_RATE='1000000',
+    TELEGRAM_GROUP_RATE='1000000', TELEGRAM_GROUP_BURST='1000000'
+)
+sys.path.insert(0, ROOT)
+from benchmarks.fake_bot_api import FakeBotAPI
+from poller import Poller, create_bot
+
+async def run(bot, poller: Poller, updates: int) -> float:
+    async with bot:
+        start = time.perf_counter()
+        await poller.run(max_updates=updates)
+        return time.perf_counter() - start
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    try:
+        with FakeBotAPI() as api:
+            for n in range(updates):
+                text = f"https://www.youtube.com/watch?v={n:011d}" if n % 2 else '/help'
+                api.push_message(text, chat_id=1000 + n % chats)
+            bot = create_bot(base_url=api.base_url)
+            poller = Poller(bot, concurrency=concurrency, timeout=0)
+            seconds = asyncio.run(run(bot, poller, updates))
+            sent = sum(1 for method, _ in api.calls if method == 'sendMessage')
+            print(f"{updates} updates from {chats} chats, concurrency {concurrency}: "
+                  f"{seconds:.2f}s, {updates / seconds:.0f} updates/s, {poller.batches} batches, "
+                  f"{sent} messages sent, {api.pending_updates} left unconfirmed")
+    finally:
+        shutil.rmtree(DIRECTORY)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Provider detection over a large corpus of mixed URLs: sequential regexes versus the registry
+
+Usage: python benchmarks/bench_providers.py [urls]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import providers
+
+URL_SHAPES = [
+    "https://www.youtube.com/watch?v={id}",
+    "https://youtu.be/{id}",
+    "https://m.youtube.com/watch?v={id}&t=10",
+    "https://youtube.com/shorts/{id}",
+    "https://vimeo.com/{num}",
+    "https://www.tiktok.com/@user/video/{num}",
+    "https://www.instagram.com/reel/{id}/",
+    "https://cdn.example.com/media/{id}.mp4",
+    "https://news.example.org/articles/{num}/{id}",
+]
+
+def legacy_detect(video_url: str):
+    """The old VideoEmbedder.get_embed_code matching order, without the HTML"""
+    youtube_patterns = [
+        r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([a-zA-Z0-9_-]+)',
+        r'youtube\.com/watch\?.*v=([a-zA-Z0-9_-]+)'
+    ]
+    for pattern in youtube_patterns:
+        match = re.search(pattern, video_url)
+        if match:
+            return 'youtube', match.group(1)
+    vimeo_match = re.search(r'vimeo\.com/(\d+)', video_url)
+    if vimeo_match:
+        return 'vimeo', vimeo_match.group(1)
+    tiktok_match = re.search(r'tiktok\.com/.*/video/(\d+)', video_url)
+    if tiktok_match:
+        return 'tiktok', tiktok_match.group(1)
+    if 'instagram.com' in video_url:
+        return 'instagram', video_url
+    video_extensions = ['.mp4', '.webm', '.ogg', '.mov', '.avi']
+    if any(ext in video_url.lower() for ext in video_extensions):
+        return 'file', video_url
+    return 'url', video_url
+
+def corpus(size: int) -> list:
+    rng = random.Random(42)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+    return [
+        rng.choice(URL_SHAPES).format(
+            id=''.join(rng.choice(alphabet) for _ in range(11)),
+            num=rng.randrange(10 ** 6, 10 ** 12)
+        )
+        for _ in range(size)
+    ]
+
+def timed(name: str, func, urls: list):
+    # Skip the regex module cache warm-up in the measurement
+    for url in urls[:100]:
+        func(url)
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed * 1e9 / len(urls):8.0f} ns/url   {len(urls) / elapsed:12,.0f} urls/s")
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    urls = corpus(size)
+    timed('legacy sequential regex', legacy_detect, urls)
+    timed('provider registry', providers.match, urls)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Memory per video record: dicts versus the compact column table
+
+Usage: python benchmarks/bench_records.py [records]
+"""
+import gc
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import jsoncodec
+from providers import match, source_key, title_for
+from record_table import RecordTable
+from records import enrich
+
+def make_records(size: int) -> list:
+    """Records shaped like VideoProcessor.save_video builds them"""
+    rng = random.Random(42)
+    usernames = [f"user{n}" for n in range(size // 100 + 1)]
+    records = []
+    for n in range(size):
+        url = rng.choice([
+            f"https://www.youtube.com/watch?v={n:011d}",
+            f"https://vimeo.com/{n + 10 ** 8}",
+            f"https://cdn.example.com/media/{n}.mp4",
+        ])
+        found = match(url)
+        records.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "url": url,
+            "added_by": rng.choice(usernames),
+            "title": title_for(found),
+            "created_at": 1700000000 + n,
+            "source_key": source_key(url, found)
+        })
+    return records
+
+def plain_dicts(records: list):
+    return {record['id']: dict(record) for record in records}
+
+def enriched_dicts(records: list):
+    """The memory store before: enriched dicts plus their serialized JSON"""
+    videos = {record['id']: enrich(dict(record)) for record in records}
+    return videos, {video_id: jsoncodec.dumps(record) for video_id, record in videos.items()}
+
+def column_table(records: list):
+    table = RecordTable()
+    for record in records:
+        table.append(record)
+    return table
+
+def measure(name: str, build, source: list):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # Fresh copies, so the strings are counted as a real store would hold them
+    records = [jsoncodec.loads(jsoncodec.dumps(record)) for record in source]
+    kept = build(records)
+    del records
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{name:<24} {used / 2 ** 20:9.1f} MiB  {used / len(source):8.0f} bytes/record")
+    return kept
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    records = make_records(size)
+    measure('plain dicts', plain_dicts, records)
+    measure('enriched dicts + JSON', enriched_dicts, records)
+    measure('record table', column_table, records)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Cold import time of each serverless entry point, checked against a budget
+
+Each entry point is imported in a fresh interpreter under `python -X importtime`.
+The check fails when the import takes longer than its budget, or when a
+read-only entry point loads the Telegram stack or another heavy client library.
+
+Usage: python benchmarks/bench_startup.py [runs] [name=budget_ms ...]
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (module, directory it is imported from, budget in ms, modules it must not load)
+ENTRY_POINTS = {
+    'index': ('index', ROOT, 150, ('telegram', 'httpx', 'requests', 'asyncio')),
+    'webhook': ('webhook', os.path.join(ROOT, 'api'), 150, ('telegram', 'httpx', 'requests', 'asyncio')),
+    'app': ('app', ROOT, 400, ('telegram', 'httpx', 'main')),
+}
+
+PROBE = (
+    "import json, sys; sys.path[:0] = {paths!r}; import {module}; "
+    "print(json.dumps([name for name in {forbidden!r} if name in sys.modules]))"
+)
+IMPORT_LINE = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| (\S.*)$')
+
+def measure(module: str, directory: str, forbidden) -> tuple:
+    """Import a module in a new interpreter: (cumulative µs, forbidden modules loaded)"""
+    env = dict(os.environ, BOT_TOKEN=os.environ.get('BOT_TOKEN', '0:benchmark'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         PROBE.format(paths=[directory, ROOT], module=module, forbidden=list(forbidden))],
+        capture_output=True, text=True, env=env, cwd=ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = 0
+    for line in result.stderr.splitlines():
+        found = IMPORT_LINE.match(line)
+        # Top-level imports have no indentation; their cumulative times add up to the startup cost
+        if found and found.group(2) == found.group(2).lstrip():
+            total += int(found.group(1))
+    return total, json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    args = sys.argv[1:]
+    runs = int(args.pop(0)) if args and args[0].isdigit() else 5
+    budgets = {name: budget for name, (_, _, budget, _) in ENTRY_POINTS.items()}
+    for override in args:
+        name, _, budget = override.partition('=')
+        budgets[name] = float(budget)
+
+    failed = False
+    for name, (module, directory, _, forbidden) in ENTRY_POINTS.items():
+        try:
+            samples = [measure(module, directory, forbidden) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{name:<8} skipped: {e}")
+            continue
+        best = min(total for total, _ in samples) / 1000
+        loaded = samples[0][1]
+        ok = best <= budgets[name] and not loaded
+        failed |= not ok
+        extra = f"  loaded {', '.join(loaded)}" if loaded else ''
+        print(f"{name:<8} {best:8.1f} ms  budget {budgets[name]:6.0f} ms  {'ok' if ok else 'FAIL'}{extra}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Watch page render throughput: per-request template rendering versus the precompiled shell
+
+Usage: python benchmarks/bench_templates.py [renders]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import templates
+from records import enrich
+
+VIDEO = enrich({
+    "id": "0f8fad5b-d9cb-469f-a165-70867728950e",
+    "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "added_by": "curator",
+    "title": "YouTube Video"
+})
+TITLE = f"{VIDEO['title']} - Video Platform"
+CONTENT = VIDEO['embed_html'] + VIDEO['info_html']
+
+def render_jinja():
+    """app.py before: render_template_string compiles the template on every call"""
+    import jinja2
+    source = templates.BASE_TEMPLATE.replace('{title}', '{{ title }}').replace('{content}', '{{ content }}')
+    environment = jinja2.Environment(autoescape=True)
+    return lambda: environment.from_string(source).render(title=TITLE, content=CONTENT).encode()
+
+def render_format():
+    """index.py before: str.format over the whole shell (CSS braces doubled so it runs)"""
+    source = templates.BASE_TEMPLATE.replace('{', '{{').replace('}', '}}')
+    source = source.replace('{{title}}', '{title}').replace('{{content}}', '{content}')
+    return lambda: source.format(title=TITLE, content=CONTENT).encode()
+
+def render_chunks():
+    """templates.render_page: pre-encoded chunks joined around the dynamic parts"""
+    return lambda: templates.render_page(TITLE, CONTENT)
+
+def timed(name: str, render, renders: int):
+    render()
+    start = time.perf_counter()
+    for _ in range(renders):
+        render()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed * 1e6 / renders:9.2f} us/page   {renders / elapsed:12,.0f} pages/s")
+
+def main():
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    try:
+        timed('jinja per request', render_jinja(), max(renders // 20, 1))
+    except ImportError:
+        print("jinja per request        skipped (jinja2 not installed)")
+    timed('str.format', render_format(), renders)
+    timed('precompiled chunks', render_chunks(), renders)
+
+if __name__ == '__main__':
+    main()
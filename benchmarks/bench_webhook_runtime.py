@@ -0,0 +1,66 @@
+"""Per-update latency of a fresh Bot and event loop versus the shared BotRuntime
+
+Usage: python benchmarks/bench_webhook_runtime.py [updates]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_bot_api import FakeBotAPI
+from bot_runtime import BotRuntime
+
+TOKEN = '123456:FAKE'
+CHAT_ID = 42
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<28} mean {statistics.mean(samples) * 1000:7.2f} ms"
+          f"   p50 {statistics.median(samples) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+def bench_per_update_bot(base_url: str, updates: int) -> list:
+    """The old webhook path: new Bot and event loop for every update"""
+    from telegram import Bot
+    samples = []
+    for _ in range(updates):
+        start = time.perf_counter()
+        bot = Bot(token=TOKEN, base_url=base_url)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(bot.send_message(chat_id=CHAT_ID, text='hello'))
+        finally:
+            loop.close()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_runtime(base_url: str, updates: int) -> list:
+    """The shared runtime: one initialized Bot and loop for the whole process"""
+    runtime = BotRuntime(TOKEN, base_url=base_url)
+    # The first call pays for initialization, like a cold start
+    runtime.run(lambda bot: bot.send_message(chat_id=CHAT_ID, text='warmup'))
+    samples = []
+    try:
+        for _ in range(updates):
+            start = time.perf_counter()
+            runtime.run(lambda bot: bot.send_message(chat_id=CHAT_ID, text='hello'))
+            samples.append(time.perf_counter() - start)
+    finally:
+        runtime.shutdown()
+    from transport import transport_stats
+    stats = transport_stats()
+    print(f"shared transport: {stats['requests']} requests, {stats['reused']} on reused connections, "
+          f"{stats['new_connections']} new ({stats['avg_connect_ms']:.2f} ms connect)")
+    return samples
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with FakeBotAPI() as api:
+        report('new Bot + loop per update', bench_per_update_bot(api.base_url, updates))
+        report('shared BotRuntime', bench_runtime(api.base_url, updates))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Minimal local stand-in for the Telegram Bot API, used by the benchmarks
+
+Run it directly and point the bot at it with
+TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import threading
+import time
+
+class FakeBotAPI:
+    """Threaded HTTP server answering Bot API methods with canned results"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.calls = []
+        self._message_id = 0
+        self._lock = threading.Lock()
+        self._updates = []
+        self._update_id = 0
+        self._updates_ready = threading.Condition(self._lock)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                method = self.path.rsplit('/', 1)[-1]
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or b'{}')
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                self._reply(api.handle(method, params))
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                method = parsed.path.rsplit('/', 1)[-1]
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                self._reply(api.handle(method, params))
+
+            def _reply(self, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def push_message(self, text: str, chat_id: int = 42, username: str = 'tester') -> int:
+        """Queue a private text message for getUpdates; returns its update_id"""
+        with self._updates_ready:
+            self._update_id += 1
+            self._message_id += 1
+            self._updates.append({
+                "update_id": self._update_id,
+                "message": {
+                    "message_id": self._message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": username, "username": username},
+                    "text": text
+                }
+            })
+            self._updates_ready.notify_all()
+            return self._update_id
+
+    @property
+    def pending_updates(self) -> int:
+        with self._lock:
+            return len(self._updates)
+
+    def _get_updates(self, params: dict) -> list:
+        """Confirm updates below offset, then long-poll for up to limit new ones"""
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        with self._updates_ready:
+            self._updates = [update for update in self._updates if update['update_id'] >= offset]
+            self._updates_ready.wait_for(lambda: self._updates, timeout)
+            return self._updates[:limit]
+
+    def handle(self, method: str, params: dict) -> dict:
+        """Build the Bot API response for one call"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append((method, params))
+            self._message_id += 1
+            message_id = self._message_id
+
+        if method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False,
+                      "supports_inline_queries": False}
+        elif method == 'getUpdates':
+            result = self._get_updates(params)
+        elif method == 'sendMessage':
+            chat_id = params.get('chat_id')
+            result = {"message_id": message_id, "date": int(time.time()),
+                      "chat": {"id": chat_id if isinstance(chat_id, int) else -1, "type": "private"},
+                      "text": params.get('text', '')}
+        else:
+            result = True
+        return {"ok": True, "result": result}
+
+    def start(self) -> 'FakeBotAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == '__main__':
+    server = FakeBotAPI(port=8081)
+    print(f"Fake Bot API listening on {server.base_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
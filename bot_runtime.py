@@ -0,0 +1,140 @@
+import os
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Optional
+
+# Telegram API endpoint, overridable to point at a local fake Bot API server
+TELEGRAM_BASE_URL = os.environ.get('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+
+class BotRuntime:
+    """Process-level Bot/Application and event loop reused across warm invocations
+
+    Everything is created lazily on the first update: one event loop running on
+    a dedicated thread, and one initialized Bot (or Application, when a setup
+    callback is given) whose HTTP connection pool stays warm between requests.
+    The pool itself comes from transport.get_requests and is shared process-wide.
+    """
+
+    def __init__(self, token: str, setup: Optional[Callable] = None, base_url: str = TELEGRAM_BASE_URL):
+        self.token = token
+        self.setup = setup
+        self.base_url = base_url
+        self.bot = None
+        self.application = None
+        self._loop = None
+        self._thread = None
+        self._init_task = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread on first use"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(
+                        target=self._run_loop, args=(loop,), name='bot-runtime', daemon=True
+                    )
+                    thread.start()
+                    self._thread = thread
+                    self._loop = loop
+        return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def _initialize(self, deadline=None):
+        """Build and initialize the Bot or Application once per process
+
+        Initializing calls getMe, so it goes through call_with_retry like every
+        other Bot API call: during an outage a cold instance fails fast with
+        CircuitOpenError or DeadlineExceeded instead of a bare network error.
+        """
+        from resilience import call_with_retry
+        from transport import get_requests
+        request, get_updates_request = get_requests()
+        if self.setup is not None:
+            from telegram.ext import Application
+            application = (
+                Application.builder().token(self.token).base_url(self.base_url)
+                .request(request).get_updates_request(get_updates_request).updater(None).build()
+            )
+            self.setup(application)
+            await call_with_retry('getMe', application.initialize, deadline)
+            self.application = application
+            self.bot = application.bot
+        else:
+            from telegram import Bot
+            bot = Bot(token=self.token, base_url=self.base_url, request=request, get_updates_request=get_updates_request)
+            await call_with_retry('getMe', bot.initialize, deadline)
+            self.bot = bot
+
+    async def _call(self, func: Callable[..., Awaitable], deadline=None):
+        if self._init_task is None:
+            self._init_task = asyncio.ensure_future(self._initialize(deadline))
+        try:
+            await self._init_task
+        except Exception:
+            # Let the next update retry initialization
+            self._init_task = None
+            raise
+        return await func(self.bot)
+
+    def submit(self, func: Callable[..., Awaitable], deadline=None):
+        """Schedule func(bot) on the runtime loop and return a concurrent future
+
+        A start-up triggered by this call has to finish within the deadline.
+        """
+        return asyncio.run_coroutine_threadsafe(self._call(func, deadline), self._ensure_loop())
+
+    def run(self, func: Callable[..., Awaitable], timeout: Optional[float] = None):
+        """Run func(bot) on the runtime loop and wait for its result"""
+        from resilience import Deadline
+        future = self.submit(func, None if timeout is None else Deadline(timeout))
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _shutdown(self):
+        if self.application is not None:
+            await self.application.shutdown()
+        elif self.bot is not None:
+            await self.bot.shutdown()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Close the Telegram client and stop the loop thread"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            if self._init_task is not None:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as e:
+            print(f"Bot runtime shutdown error: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
+            self.bot = self.application = self._init_task = None
+
+_runtimes = []
+
+def create_runtime(token: str, setup: Optional[Callable] = None) -> BotRuntime:
+    """Create a runtime that is shut down cleanly when the process exits"""
+    runtime = BotRuntime(token, setup=setup)
+    _runtimes.append(runtime)
+    return runtime
+
+@atexit.register
+def shutdown_all():
+    """Shut down every runtime created in this process"""
+    for runtime in _runtimes:
+        runtime.shutdown()
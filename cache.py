@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and negative caching"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, negative_ttl: float = 10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=_MISSING):
+        """Get a cached value, or default when missing or expired
+
+        Cached negative results are returned as None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+        return default
+
+    def set(self, key, value):
+        """Cache a value; None is cached as a negative result with the shorter TTL"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize
+        }
+
+class PageCache:
+    """LRU cache of fully rendered pages, bounded by total bytes
+
+    Each entry holds the page's variants (encoding -> bytes, None for identity)
+    and is tagged with the template version it was rendered with, so a
+    template change never serves a stale page.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(variants: dict) -> int:
+        return sum(len(body) for body in variants.values())
+
+    def get(self, video_id: str, version: str):
+        """Get the cached variants, or None"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(video_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def set(self, video_id: str, version: str, variants: dict):
+        """Cache a rendered page, evicting least recently used pages past the byte limit"""
+        size = self._size(variants)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(video_id, None)
+            if old is not None:
+                self._bytes -= self._size(old[1])
+            self._entries[video_id] = (version, variants)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def invalidate(self, video_id: str):
+        """Drop the page for a video whose record changed"""
+        with self._lock:
+            old = self._entries.pop(video_id, None)
+            if old is not None:
+                self._bytes -= self._size(old[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Hit ratio and memory use for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
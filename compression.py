@@ -0,0 +1,102 @@
+import gzip
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this gain nothing from compression
+MIN_COMPRESS_SIZE = 256
+
+# Precompressed content is compressed once, so it gets the best ratio;
+# dynamic responses trade ratio for CPU time
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+DYNAMIC_GZIP_LEVEL = 6
+DYNAMIC_BROTLI_QUALITY = 5
+
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported Content-Encoding for an Accept-Encoding header
+
+    Returns None for identity. Codings with q=0 are refused; otherwise the
+    highest q wins, preferring brotli over gzip on ties.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding] = quality
+    best, best_quality = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        quality = weights.get(coding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compress a complete body with the given Content-Encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=STATIC_BROTLI_QUALITY if static else DYNAMIC_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=STATIC_GZIP_LEVEL if static else DYNAMIC_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def precompress(body: bytes) -> Dict[Optional[str], bytes]:
+    """Compress a body once in every supported encoding, for caching
+
+    The uncompressed body is kept under None, so identity clients are
+    served without decompressing anything.
+    """
+    variants = {encoding: compress(body, encoding, static=True) for encoding in SUPPORTED_ENCODINGS}
+    variants[None] = body
+    return variants
+
+def select(variants: Dict[Optional[str], bytes], encoding: Optional[str]):
+    """Pick the stored variant for a negotiated encoding
+
+    Returns (body, content_encoding). Clients that accept neither stored
+    encoding get the uncompressed variant.
+    """
+    if encoding in variants:
+        return variants[encoding], encoding
+    return variants[None], None
+
+def encode(body: bytes, encoding: Optional[str]):
+    """Compress a dynamic response body for a negotiated encoding
+
+    Returns (body, content_encoding); small bodies are sent as they are.
+    """
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    return compress(body, encoding), encoding
+
+def iter_compressed(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Stream chunks through an incremental compressor, keeping memory constant"""
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=DYNAMIC_BROTLI_QUALITY)
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(DYNAMIC_GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress_chunk, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = compress_chunk(chunk)
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,34 @@
+import threading
+from collections import deque
+
+class RecentUpdates:
+    """Fixed-size ring buffer of recently seen Telegram update_ids"""
+
+    def __init__(self, maxlen: int = 4096):
+        self._order = deque(maxlen=maxlen)
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def add(self, update_id: int) -> bool:
+        """Record an update_id; False when it was already present"""
+        with self._lock:
+            if update_id in self._seen:
+                return False
+            if len(self._order) == self._order.maxlen:
+                self._seen.discard(self._order[0])
+            self._order.append(update_id)
+            self._seen.add(update_id)
+            return True
+
+    def discard(self, update_id: int):
+        """Forget an update_id so a redelivery is processed again"""
+        with self._lock:
+            if update_id in self._seen:
+                self._seen.discard(update_id)
+                self._order.remove(update_id)
+
+    def __contains__(self, update_id: int) -> bool:
+        return update_id in self._seen
+
+    def __len__(self) -> int:
+        return len(self._order)
@@ -0,0 +1,62 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+# Cache-Control per kind of response. Video records never change after
+# creation, so their pages and JSON can live at the edge for a long time;
+# listings and misses are kept short because new videos keep arriving.
+CACHE_CONTROL = {
+    'video': 'public, max-age=300, s-maxage=86400, stale-while-revalidate=604800',
+    'static': 'public, max-age=3600, s-maxage=86400, stale-while-revalidate=604800',
+    'listing': 'public, max-age=0, s-maxage=30, stale-while-revalidate=300',
+    'missing': 'public, max-age=0, s-maxage=10',
+    'private': 'no-store'
+}
+
+# Every response may be sent gzip, brotli or identity coded under the same tag,
+# which only a weak validator allows: a strong one must differ per coding
+def make_etag(*parts) -> str:
+    """Weak ETag derived from the values that determine a response body"""
+    digest = hashlib.sha1('\x00'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+def body_etag(body: bytes) -> str:
+    """Weak ETag for a response whose body is already built"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith('W/') else tag
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+def is_not_modified(headers, etag: Optional[str], last_modified: Optional[float] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since for a GET request
+
+    If-None-Match takes precedence when present, as RFC 9110 requires.
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        if etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        # GET uses weak comparison, so W/ prefixes are ignored
+        return '*' in tags or _opaque(etag) in (_opaque(tag) for tag in tags)
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def cache_headers(policy: str, etag: Optional[str] = None,
+                  last_modified: Optional[float] = None) -> List[Tuple[str, str]]:
+    """Validator and Cache-Control headers for a response"""
+    headers = [('Cache-Control', CACHE_CONTROL[policy])]
+    if etag is not None:
+        headers.append(('ETag', etag))
+    if last_modified is not None:
+        headers.append(('Last-Modified', http_date(last_modified)))
+    return headers
@@ -0,0 +1,99 @@
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, Optional
+
+# Video ID configuration
+VIDEO_ID_SCHEME = os.environ.get('VIDEO_ID_SCHEME', 'short')  # short (time-ordered base62) or uuid
+VIDEO_ID_NODE = os.environ.get('VIDEO_ID_NODE')  # 0-1023; derived from host and process when unset
+
+# Digits in ASCII order, so fixed-width IDs sort as strings in the order they were made
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_DIGITS = {digit: value for value, digit in enumerate(BASE62)}
+
+# Short ID layout: 41 bits of milliseconds since EPOCH_MS, 10 bits of node, 12 bits of sequence.
+# 63 bits always fit in 11 base62 digits.
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+SHORT_ID_LENGTH = 11
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+def encode_base62(value: int, width: int = SHORT_ID_LENGTH) -> str:
+    digits = []
+    while value:
+        value, digit = divmod(value, 62)
+        digits.append(BASE62[digit])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+def decode_base62(text: str) -> int:
+    value = 0
+    for digit in text:
+        value = value * 62 + _DIGITS[digit]
+    return value
+
+def is_short_id(video_id: str) -> bool:
+    return len(video_id) == SHORT_ID_LENGTH and all(digit in _DIGITS for digit in video_id)
+
+def id_timestamp(video_id: str) -> Optional[float]:
+    """Creation time embedded in a short ID, or None for other IDs"""
+    if not is_short_id(video_id):
+        return None
+    return ((decode_base62(video_id) >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
+
+def _default_node() -> int:
+    # Distinct per host and process with high probability; set VIDEO_ID_NODE to guarantee it
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_NODE
+
+class ShortIdGenerator:
+    """Snowflake-style IDs: time, node and a per-millisecond sequence, base62 encoded"""
+
+    def __init__(self, node: Optional[int] = None):
+        self.node = _default_node() if node is None else node
+        if not 0 <= self.node <= MAX_NODE:
+            raise ValueError(f"ID node must be between 0 and {MAX_NODE}")
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            # Never go back in time, even when the clock does
+            now = max(int(time.time() * 1000) - EPOCH_MS, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            value = (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node << SEQUENCE_BITS) | self._sequence
+        return encode_base62(value)
+
+def uuid_id() -> str:
+    return str(uuid.uuid4())
+
+# Generator factories by scheme name; register more to plug in other schemes
+ID_SCHEMES: Dict[str, Callable[[], Callable[[], str]]] = {
+    'short': lambda: ShortIdGenerator(int(VIDEO_ID_NODE) if VIDEO_ID_NODE else None),
+    'uuid': lambda: uuid_id
+}
+
+_generator = None
+_generator_lock = threading.Lock()
+
+def new_video_id() -> str:
+    """Make an ID for a new video with the configured scheme"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                if VIDEO_ID_SCHEME not in ID_SCHEMES:
+                    raise ValueError(f"Unknown video ID scheme: {VIDEO_ID_SCHEME}")
+                _generator = ID_SCHEMES[VIDEO_ID_SCHEME]()
+    return _generator()
@@ -0,0 +1,26 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is always available
+    orjson = None
+
+# JSON implementation: auto (orjson when installed), orjson or stdlib
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
+def _stdlib_dumps(obj) -> bytes:
+    # Same compact, UTF-8 output as orjson so both backends write one canonical form
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+
+def _select_backend(name: str):
+    if name not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError(f"Unknown JSON backend: {name}")
+    if name == 'orjson' and orjson is None:
+        print("JSON_BACKEND=orjson but orjson is not installed, using the stdlib encoder")
+    if name != 'stdlib' and orjson is not None:
+        return 'orjson', orjson.dumps, orjson.loads
+    return 'stdlib', _stdlib_dumps, json.loads
+
+# Chosen once at import; dumps returns bytes and loads accepts bytes or str
+BACKEND, dumps, loads = _select_backend(JSON_BACKEND)
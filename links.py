@@ -0,0 +1,157 @@
+import os
+import re
+from typing import Awaitable, Callable, List, Optional, Tuple
+from records import is_posted
+
+# URLs taken from one message; the rest are ignored
+MAX_URLS_PER_MESSAGE = int(os.environ.get('MAX_URLS_PER_MESSAGE', '50'))
+KEYBOARD_ROW_SIZE = max(1, min(8, int(os.environ.get('KEYBOARD_ROW_SIZE', '2'))))  # watch buttons per row
+
+# Telegram limits: characters per message, buttons per inline keyboard
+MAX_MESSAGE_LENGTH = 4096
+MAX_KEYBOARD_BUTTONS = 100
+BUTTON_TITLE_LENGTH = 24
+TITLE_LENGTH = 200
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"]+', re.IGNORECASE)
+SCHEME = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*://')
+TRAILING_PUNCTUATION = '.,;:!?)]}\'"'
+
+# Keyboard: rows of (button text, URL) pairs, turned into InlineKeyboardButtons by the caller
+Keyboard = List[List[Tuple[str, str]]]
+
+def is_valid_url(url: str) -> bool:
+    return url.startswith(('http://', 'https://')) and '.' in url
+
+def extract_urls(text: str, entities: Optional[list] = None, limit: int = MAX_URLS_PER_MESSAGE) -> List[str]:
+    """Every URL in a message, in order and without repeats
+
+    Telegram's url and text_link entities are used when the message has any;
+    their offsets count UTF-16 code units, so they index the raw, unstripped
+    text as UTF-16. Without entities the text itself is scanned.
+    """
+    found = []
+    encoded = None
+    for entity in entities or ():
+        if entity.get('type') == 'text_link':
+            found.append(entity.get('url', ''))
+        elif entity.get('type') == 'url':
+            if encoded is None:
+                encoded = text.encode('utf-16-le')
+            start = entity['offset'] * 2
+            found.append(encoded[start:start + entity['length'] * 2].decode('utf-16-le', 'replace'))
+    if not found:
+        found = [url.rstrip(TRAILING_PUNCTUATION) for url in URL_PATTERN.findall(text)]
+
+    urls, seen = [], set()
+    for url in found:
+        # Telegram also marks bare domains like youtu.be/abc as links
+        if not SCHEME.match(url):
+            url = 'https://' + url
+        if is_valid_url(url) and url not in seen:
+            seen.add(url)
+            urls.append(url)
+            if len(urls) >= limit:
+                break
+    return urls
+
+def _length(text: str) -> int:
+    """Length as Telegram counts it, in UTF-16 code units"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _shorten(text: str, length: int) -> str:
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+def _post(lines: List[str], buttons: List[Tuple[str, str]]) -> Tuple[str, Keyboard]:
+    if len(lines) == 1:
+        text = "🎬 New Video Available!\n\n" + lines[0] + "\n\nClick the button below to watch:"
+    else:
+        text = f"🎬 {len(lines)} New Videos Available!\n\n" + '\n'.join(lines) + "\n\nClick a button below to watch:"
+    rows = [buttons[start:start + KEYBOARD_ROW_SIZE] for start in range(0, len(buttons), KEYBOARD_ROW_SIZE)]
+    return text, rows
+
+def channel_posts(records: List[dict], base_url: str) -> List[Tuple[str, Keyboard, List[dict]]]:
+    """Channel posts announcing several videos, split to fit Telegram's limits
+
+    Each post lists its videos and carries one watch button per video, in
+    rows of KEYBOARD_ROW_SIZE. A new post is started when the keyboard or
+    the text would go over its limit. Posts come with the records they
+    announce, so each can be marked posted once it is sent.
+    """
+    posts, lines, buttons, length, announced = [], [], [], 0, []
+    # Room for the header and footer around the list
+    budget = MAX_MESSAGE_LENGTH - 100
+    for number, record in enumerate(records, 1):
+        title = record.get('title') or 'Video'
+        line = f"{number}. 📺 {_shorten(title, TITLE_LENGTH)}"
+        if lines and (len(buttons) >= MAX_KEYBOARD_BUTTONS or length + _length(line) + 1 > budget):
+            posts.append(_post(lines, buttons) + (announced,))
+            lines, buttons, length, announced = [], [], 0, []
+        lines.append(line)
+        announced.append(record)
+        length += _length(line) + 1
+        buttons.append((f"🎥 {number}. {_shorten(title, BUTTON_TITLE_LENGTH)}", f"{base_url}/watch/{record['id']}"))
+    if lines:
+        posts.append(_post(lines, buttons) + (announced,))
+    return posts
+
+def summary_message(added: List[dict], existing: List[dict], base_url: str) -> str:
+    """One Markdown reply covering every URL of a message, cut to fit one message"""
+    sections = []
+    if added:
+        videos = "video" if len(added) == 1 else "videos"
+        sections.append((f"✅ {len(added)} {videos} added, now being posted to the channel:", added))
+    if existing:
+        were = "was" if len(existing) == 1 else "were"
+        sections.append((f"ℹ️ {len(existing)} {were} already added:", existing))
+
+    parts, length = [], 0
+    budget = MAX_MESSAGE_LENGTH - 100
+    for header, records in sections:
+        parts.append(header)
+        length += _length(header) + 2
+        for shown, record in enumerate(records):
+            line = f"🆔 `{record['id']}` {base_url}/watch/{record['id']}"
+            if length + _length(line) + 1 > budget:
+                parts.append(f"…and {len(records) - shown} more")
+                break
+            parts.append(line)
+            length += _length(line) + 1
+        parts.append('')
+    return '\n'.join(parts).strip()
+
+async def announce(stored: List[dict], video_ids: List[str], base_url: str,
+                   post: Callable[[str, Keyboard], Awaitable],
+                   mark_posted: Callable[[List[dict], object], None],
+                   reply: Optional[Callable[[str], Awaitable]] = None) -> str:
+    """Announce the videos saved from one message and return the summary reply
+
+    stored holds the store's record for each of video_ids. New videos, and
+    earlier ones whose channel post never went out, are posted with
+    post(text, keyboard), and mark_posted(records, message) is called for
+    each delivered post. The summary is sent with reply at the same time;
+    without reply the caller sends it. A failed summary is only logged, a
+    failed post is raised once the others are marked.
+    """
+    # Imported here so that importing links never loads asyncio
+    from outbound import send_concurrently
+
+    stored = list({record['id']: record for record in stored}.values())
+    new_ids = set(video_ids)
+    added = [record for record in stored if record['id'] in new_ids or not is_posted(record)]
+    added_ids = {record['id'] for record in added}
+    existing = [record for record in stored if record['id'] not in added_ids]
+    posts = channel_posts(added, base_url)
+    summary = summary_message(added, existing, base_url)
+
+    calls = [post(text, rows) for text, rows, _ in posts]
+    if reply is not None:
+        calls.append(reply(summary))
+    results = await send_concurrently(*calls)
+    for result, (_, _, records) in zip(results, posts):
+        if not isinstance(result, Exception):
+            mark_posted(records, result)
+    for result in results[:len(posts)]:
+        if isinstance(result, Exception):
+            raise result
+    return summary
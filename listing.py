@@ -0,0 +1,67 @@
+import os
+from typing import Iterator, List, Optional, Tuple
+from httpcache import make_etag
+import jsoncodec
+
+# /api/videos pagination limits
+VIDEOS_PAGE_SIZE = int(os.environ.get('VIDEOS_PAGE_SIZE', '100'))  # used when ?limit is missing or invalid
+VIDEOS_MAX_PAGE_SIZE = int(os.environ.get('VIDEOS_MAX_PAGE_SIZE', '1000'))
+
+# Records read from the store per query while streaming a listing
+STREAM_BATCH_SIZE = 500
+
+NDJSON_TYPE = 'application/x-ndjson'
+
+def parse_limit(value: Optional[str]) -> int:
+    """Clamp a ?limit parameter to the allowed page sizes"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return VIDEOS_PAGE_SIZE
+    return max(1, min(limit, VIDEOS_MAX_PAGE_SIZE))
+
+def wants_ndjson(format_param: Optional[str], accept: Optional[str]) -> bool:
+    """NDJSON is requested with ?format=ndjson or an Accept header"""
+    return format_param == 'ndjson' or NDJSON_TYPE in (accept or '')
+
+def listing_etag(store, *parts) -> str:
+    """ETag for a listing, from the store version rather than the body"""
+    return make_etag('videos', store.version(), *parts)
+
+def page_body(store, after: Optional[str], limit: int) -> bytes:
+    """One page of videos plus the cursor for the next one (null on the last page)
+
+    Records are written out as stored, without being parsed and re-encoded.
+    """
+    rows = store.page_json(after, limit)
+    next_after = rows[-1][0] if len(rows) == limit else None
+    return b''.join((
+        b'{"videos":[', b','.join(data for _, data in rows), b'],"next_after":', jsoncodec.dumps(next_after), b'}'
+    ))
+
+def _batches(store, after: Optional[str] = None) -> Iterator[List[Tuple[str, bytes]]]:
+    """Walk the store in insertion order, one bounded query at a time"""
+    while True:
+        rows = store.page_json(after, STREAM_BATCH_SIZE)
+        if rows:
+            yield rows
+        if len(rows) < STREAM_BATCH_SIZE:
+            return
+        after = rows[-1][0]
+
+def iter_ndjson(store, after: Optional[str] = None) -> Iterator[bytes]:
+    """Stream records as newline-delimited JSON, one chunk per batch"""
+    for rows in _batches(store, after):
+        yield b''.join(data + b'\n' for _, data in rows)
+
+def iter_object(store) -> Iterator[bytes]:
+    """Stream the original {id: record} listing without building it in memory"""
+    yield b'{'
+    separator = b''
+    for rows in _batches(store):
+        chunk = []
+        for video_id, data in rows:
+            chunk.append(separator + jsoncodec.dumps(video_id) + b':' + data)
+            separator = b','
+        yield b''.join(chunk)
+    yield b'}'
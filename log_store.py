@@ -0,0 +1,496 @@
+import fcntl
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from dedup import RecentUpdates
+from records import decode_record, encode_record, public_json
+from video_store import VideoStore
+import jsoncodec
+
+# Log store configuration
+VIDEO_LOG_INDEX_EVERY = int(os.environ.get('VIDEO_LOG_INDEX_EVERY', '1024'))  # unindexed records before the index is rewritten
+VIDEO_LOG_COMPACT_RATIO = float(os.environ.get('VIDEO_LOG_COMPACT_RATIO', '0.5'))  # superseded/live records that trigger compaction
+
+LOG_NAME = 'videos.log'
+INDEX_NAME = 'videos.idx'
+LOCK_NAME = 'videos.lock'
+
+# Log file: magic, format, generation; then entries of
+# (data length, crc32 of id + data, offset of the record's first version, id length), id, data.
+# Data is the record's public JSON, then a newline and its private fields' JSON when it has any;
+# the codec never writes a raw newline, so the first one splits them.
+LOG_HEADER = struct.Struct('<4sIQ')
+ENTRY_HEADER = struct.Struct('<IIQH')
+LOG_MAGIC = b'VLOG'
+
+# Index file: magic, format, generation, log bytes covered, videos, superseded entries, entries;
+# then fixed-width (key, offset, size) entries sorted by key
+INDEX_HEADER = struct.Struct('<4sIQQQQQ')
+INDEX_ENTRY = struct.Struct('<16sQI')
+INDEX_MAGIC = b'VIDX'
+FORMAT = 1
+
+def _key(kind: bytes, value: str) -> bytes:
+    """Fixed-width index key; a hit is confirmed against the record it points at"""
+    return hashlib.blake2b(kind + value.encode(), digest_size=16).digest()
+
+def _id_key(video_id: str) -> bytes:
+    return _key(b'id:', video_id)
+
+def _source_key(source_key: str) -> bytes:
+    return _key(b'source:', source_key)
+
+def _stored(record: dict) -> bytes:
+    data, private = encode_record(record)
+    return data + b'\n' + private if private else data
+
+def _public(data: bytes) -> bytes:
+    # Entries written before the split carry the private fields inline
+    return public_json(data.partition(b'\n')[0])
+
+def _decode(data: bytes) -> dict:
+    public, _, private = data.partition(b'\n')
+    return decode_record(public, private)
+
+class LogVideoStore(VideoStore):
+    """Append-only record log with a memory-mapped sorted offset index
+
+    Opening the store maps the index and reads only the records appended
+    since it was last written, so startup does not depend on the catalog
+    size. A lookup is a binary search over the mapped index plus one read.
+    A torn record at the end of the log, left by a crash mid-write, is cut
+    off when the store is opened. Rewritten records leave their old version
+    behind until compaction copies the live records to a new log.
+
+    One process writes a directory, holding an exclusive lock on it. Other
+    processes open it read-only: they never truncate or write anything, and
+    catch up with the writer when a lookup misses or a listing is read.
+    """
+
+    def __init__(self, directory: str, readonly: bool = False):
+        super().__init__()
+        self.directory = directory
+        self.readonly = readonly
+        self._log_path = os.path.join(directory, LOG_NAME)
+        self._index_path = os.path.join(directory, INDEX_NAME)
+        self._lock = threading.RLock()
+        self._updates = RecentUpdates()
+        self._fd = None
+        self._index = (None, 0)
+        self._index_inode = None
+        self._lock_fd = None
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+            self._lock_fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(self._lock_fd)
+                raise RuntimeError(f"Video log {directory} is already open for writing in another process")
+        self._open()
+
+    # Opening and recovery
+
+    def _open(self):
+        self._fd = os.open(self._log_path, os.O_RDONLY if self.readonly else os.O_RDWR | os.O_CREAT, 0o644)
+        stat = os.fstat(self._fd)
+        self._log_inode, size = stat.st_ino, stat.st_size
+        # Records written after the index, by key: (offset, size)
+        self._tail = {}
+        self._videos = 0
+        self._dead = 0
+        if size < LOG_HEADER.size:
+            if self.readonly:
+                # The writer is creating the log; look again on the next refresh
+                self._generation, self._size, self._log_inode = 0, LOG_HEADER.size, None
+                return
+            os.ftruncate(self._fd, 0)
+            os.pwrite(self._fd, LOG_HEADER.pack(LOG_MAGIC, FORMAT, 0), 0)
+            size = LOG_HEADER.size
+        magic, _, self._generation = LOG_HEADER.unpack(os.pread(self._fd, LOG_HEADER.size, 0))
+        if magic != LOG_MAGIC:
+            raise ValueError(f"Not a video log: {self._log_path}")
+
+        covered = LOG_HEADER.size
+        header = self._map_index()
+        if header is not None and header[2] == self._generation and header[3] <= size:
+            _, _, _, covered, self._videos, self._dead, _ = header
+        else:
+            # Missing, stale or damaged index: rebuild it from the whole log
+            self._unmap_index()
+        self._size = self._recover(covered, size)
+        if not self.readonly and (header is None or covered == LOG_HEADER.size and self._tail):
+            self._write_index()
+
+    def _log(self):
+        """Buffered reader over the open log, which stays valid if the path is replaced"""
+        return os.fdopen(os.dup(self._fd), 'rb')
+
+    def _recover(self, start: int, size: int) -> int:
+        """Index the records after start; cut the log at the first torn or corrupt entry
+
+        Read-only stores stop before such an entry instead: it may be a
+        record the writer is still appending.
+        """
+        offset = start
+        with self._log() as log:
+            log.seek(start)
+            while offset < size:
+                entry = self._read_entry(log, offset, size)
+                if entry is None:
+                    if not self.readonly:
+                        print(f"Video log: truncating torn tail at {offset} of {size} bytes")
+                        os.ftruncate(self._fd, offset)
+                    break
+                entry_size, origin, video_id, data = entry
+                self._index_record(video_id, _decode(data).get('source_key'), offset, entry_size, origin)
+                offset += entry_size
+        return offset
+
+    @staticmethod
+    def _read_entry(log, offset: int, size: int):
+        header = log.read(ENTRY_HEADER.size)
+        if len(header) < ENTRY_HEADER.size:
+            return None
+        length, checksum, origin, id_length = ENTRY_HEADER.unpack(header)
+        entry_size = ENTRY_HEADER.size + id_length + length
+        if offset + entry_size > size:
+            return None
+        body = log.read(id_length + length)
+        if len(body) < id_length + length or zlib.crc32(body) != checksum:
+            return None
+        return entry_size, origin, body[:id_length].decode(), body[id_length:]
+
+    def _index_record(self, video_id: str, source_key: Optional[str], offset: int, size: int, origin: int):
+        """Point the in-memory tail index at a record just read or written"""
+        if origin == offset:
+            self._videos += 1
+        else:
+            self._dead += 1
+        self._tail[_id_key(video_id)] = (offset, size)
+        if source_key:
+            key = _source_key(source_key)
+            if key not in self._tail and self._search(key) is None:
+                self._tail[key] = (offset, size)
+
+    # Index
+
+    def _map_index(self):
+        self._index_inode = None
+        try:
+            with open(self._index_path, 'rb') as index_file:
+                stat = os.fstat(index_file.fileno())
+                self._index_inode = stat.st_ino
+                if stat.st_size < INDEX_HEADER.size:
+                    return None
+                mapped = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        header = INDEX_HEADER.unpack_from(mapped, 0)
+        if header[0] != INDEX_MAGIC or header[1] != FORMAT or len(mapped) < INDEX_HEADER.size + header[6] * INDEX_ENTRY.size:
+            mapped.close()
+            return None
+        self._index = (mapped, header[6])
+        return header
+
+    def _unmap_index(self):
+        mapped, _ = self._index
+        self._index = (None, 0)
+        if mapped is not None:
+            mapped.close()
+
+    def _search(self, key: bytes) -> Optional[Tuple[int, int]]:
+        """Binary search the mapped index for a key; (offset, size) or None"""
+        mapped, count = self._index
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = INDEX_HEADER.size + middle * INDEX_ENTRY.size
+            probe = mapped[position:position + 16]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return INDEX_ENTRY.unpack_from(mapped, position)[1:]
+        return None
+
+    def _lookup(self, key: bytes) -> Optional[Tuple[int, int]]:
+        return self._tail.get(key) or self._search(key)
+
+    def _write_index(self):
+        """Merge the tail into the sorted index file and map the new one"""
+        mapped, count = self._index
+        indexed = INDEX_ENTRY.iter_unpack(mapped[INDEX_HEADER.size:INDEX_HEADER.size + count * INDEX_ENTRY.size]) if count else ()
+        tail = sorted((key, offset, size) for key, (offset, size) in self._tail.items())
+        # Tail entries sort before indexed ones with the same key, so they win
+        merged = heapq.merge(((key, 0, offset, size) for key, offset, size in tail),
+                             ((key, 1, offset, size) for key, offset, size in indexed))
+        temporary = self._index_path + '.tmp'
+        entries, last = 0, None
+        with open(temporary, 'wb') as index_file:
+            index_file.write(b'\0' * INDEX_HEADER.size)
+            for key, _, offset, size in merged:
+                if key != last:
+                    index_file.write(INDEX_ENTRY.pack(key, offset, size))
+                    entries, last = entries + 1, key
+            index_file.seek(0)
+            index_file.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, FORMAT, self._generation, self._size, self._videos, self._dead, entries
+            ))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temporary, self._index_path)
+        self._unmap_index()
+        self._tail = {}
+        self._map_index()
+
+    def _refresh(self):
+        """Catch up with the writer from a read-only store
+
+        The writer replaces the index when it rewrites it and the log when it
+        compacts, so a changed inode means reopening; otherwise only the
+        records appended since the last look are read.
+        """
+        if not self.readonly:
+            return
+        try:
+            log_inode = os.stat(self._log_path).st_ino
+        except FileNotFoundError:
+            return
+        try:
+            index_inode = os.stat(self._index_path).st_ino
+        except FileNotFoundError:
+            index_inode = None
+        if log_inode != self._log_inode or index_inode != self._index_inode:
+            self._unmap_index()
+            os.close(self._fd)
+            self._open()
+            return
+        size = os.fstat(self._fd).st_size
+        if size > self._size:
+            self._size = self._recover(self._size, size)
+
+    # Reading
+
+    def _read(self, location: Optional[Tuple[int, int]]) -> Optional[Tuple[int, str, bytes]]:
+        """One read of a whole entry: (origin, id, data)"""
+        if location is None:
+            return None
+        offset, size = location
+        entry = os.pread(self._fd, size, offset)
+        length, _, origin, id_length = ENTRY_HEADER.unpack_from(entry)
+        body = entry[ENTRY_HEADER.size:]
+        return origin, body[:id_length].decode(), body[id_length:]
+
+    def _entry_for(self, video_id: str):
+        entry = self._read(self._lookup(_id_key(video_id)))
+        # Keys are hashes, so make sure the record is the one asked for
+        return entry if entry is not None and entry[1] == video_id else None
+
+    def _data(self, video_id: str) -> Optional[bytes]:
+        # Reads hold the lock too, so the index and log are never swapped under them
+        with self._lock:
+            entry = self._entry_for(video_id)
+            if entry is None and self.readonly:
+                self._refresh()
+                entry = self._entry_for(video_id)
+        return entry[2] if entry is not None else None
+
+    def get(self, video_id: str) -> Optional[dict]:
+        data = self._data(video_id)
+        return _decode(data) if data is not None else None
+
+    def get_json(self, video_id: str) -> Optional[bytes]:
+        data = self._data(video_id)
+        return _public(data) if data is not None else None
+
+    def _find_by_source(self, source_key: str) -> Optional[dict]:
+        entry = self._read(self._lookup(_source_key(source_key)))
+        if entry is None:
+            return None
+        entry = self._entry_for(entry[1])
+        record = _decode(entry[2]) if entry is not None else None
+        return record if record is not None and record.get('source_key') == source_key else None
+
+    def find_by_source(self, source_key: str) -> Optional[dict]:
+        with self._lock:
+            record = self._find_by_source(source_key)
+            if record is None and self.readonly:
+                self._refresh()
+                record = self._find_by_source(source_key)
+            return record
+
+    def _iter_live(self, start: int) -> Iterator[Tuple[str, bytes]]:
+        """Records in the order they were first added, each in its latest version"""
+        size = self._size
+        with self._log() as log:
+            log.seek(start)
+            offset = start
+            while offset < size:
+                length, _, origin, id_length = ENTRY_HEADER.unpack(log.read(ENTRY_HEADER.size))
+                video_id = log.read(id_length).decode()
+                data = log.read(length)
+                if origin == offset:
+                    latest = self._lookup(_id_key(video_id))
+                    if latest is not None and latest[0] != offset:
+                        data = self._read(latest)[2]
+                    yield video_id, data
+                offset += ENTRY_HEADER.size + id_length + length
+
+    def page_json(self, after: Optional[str] = None, limit: int = 100) -> List[Tuple[str, bytes]]:
+        with self._lock:
+            self._refresh()
+            start = LOG_HEADER.size
+            if after is not None:
+                entry = self._entry_for(after)
+                if entry is None:
+                    return []
+                start = entry[0] + self._entry_size(entry[0])
+            rows = []
+            for video_id, data in self._iter_live(start):
+                rows.append((video_id, _public(data)))
+                if len(rows) == limit:
+                    break
+            return rows
+
+    def _entry_size(self, offset: int) -> int:
+        """Size of the entry at an offset"""
+        length, _, _, id_length = ENTRY_HEADER.unpack(os.pread(self._fd, ENTRY_HEADER.size, offset))
+        return ENTRY_HEADER.size + id_length + length
+
+    def page(self, after: Optional[str] = None, limit: int = 100) -> List[dict]:
+        return [jsoncodec.loads(data) for _, data in self.page_json(after, limit)]
+
+    def all(self) -> Dict[str, dict]:
+        with self._lock:
+            self._refresh()
+            return {video_id: jsoncodec.loads(_public(data)) for video_id, data in self._iter_live(LOG_HEADER.size)}
+
+    def version(self) -> str:
+        with self._lock:
+            self._refresh()
+            return f"{self._generation}:{self._size}"
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._videos
+
+    # Writing
+
+    def _check_writable(self):
+        if self.readonly:
+            raise RuntimeError(f"Video log {self.directory} is open read-only")
+
+    def _append(self, records: List[dict]):
+        """Write records at the end of the log in one write and index them"""
+        chunks, offset, indexed = [], self._size, []
+        for record in records:
+            video_id = record['id']
+            existing = self._entry_for(video_id)
+            origin = existing[0] if existing is not None else offset
+            encoded_id = video_id.encode()
+            body = encoded_id + _stored(record)
+            chunks.append(ENTRY_HEADER.pack(len(body) - len(encoded_id), zlib.crc32(body), origin, len(encoded_id)))
+            chunks.append(body)
+            size = ENTRY_HEADER.size + len(body)
+            indexed.append((video_id, record.get('source_key'), offset, size, origin))
+            offset += size
+        os.pwrite(self._fd, b''.join(chunks), self._size)
+        self._size = offset
+        for entry in indexed:
+            self._index_record(*entry)
+        if len(self._tail) >= VIDEO_LOG_INDEX_EVERY:
+            self._write_index()
+            if self._dead > 1024 and self._dead > self._videos * VIDEO_LOG_COMPACT_RATIO:
+                self.compact()
+
+    def save_many(self, records: Iterable[dict]):
+        self._check_writable()
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            self._append(records)
+        self._notify(records)
+
+    def add_videos(self, records: List[dict]) -> List[dict]:
+        self._check_writable()
+        stored, added, pending = [], [], {}
+        with self._lock:
+            for record in records:
+                key = record.get('source_key')
+                existing = (pending.get(key) or self._find_by_source(key)) if key else None
+                if existing is not None:
+                    stored.append(existing)
+                    continue
+                if key:
+                    pending[key] = record
+                stored.append(record)
+                added.append(record)
+            if added:
+                self._append(added)
+        self._notify(added)
+        return stored
+
+    def compact(self):
+        """Copy the live records to a new log generation and index it from scratch"""
+        self._check_writable()
+        with self._lock:
+            generation = self._generation + 1
+            temporary = self._log_path + '.tmp'
+            with open(temporary, 'wb') as log:
+                log.write(LOG_HEADER.pack(LOG_MAGIC, FORMAT, generation))
+                offset = LOG_HEADER.size
+                tail, videos = {}, 0
+                for video_id, data in self._iter_live(LOG_HEADER.size):
+                    # Re-encoding moves the private fields of older entries out of the public JSON
+                    record = _decode(data)
+                    data = _stored(record)
+                    encoded_id = video_id.encode()
+                    body = encoded_id + data
+                    log.write(ENTRY_HEADER.pack(len(data), zlib.crc32(body), offset, len(encoded_id)))
+                    log.write(body)
+                    size = ENTRY_HEADER.size + len(body)
+                    tail[_id_key(video_id)] = (offset, size)
+                    source_key = record.get('source_key')
+                    if source_key:
+                        tail.setdefault(_source_key(source_key), (offset, size))
+                    offset += size
+                    videos += 1
+                log.flush()
+                os.fsync(log.fileno())
+            # A crash between the two replaces leaves an index of the wrong generation,
+            # which is rebuilt from the log on the next open
+            os.replace(temporary, self._log_path)
+            os.close(self._fd)
+            self._fd = os.open(self._log_path, os.O_RDWR)
+            self._log_inode = os.fstat(self._fd).st_ino
+            self._unmap_index()
+            self._generation, self._size, self._videos, self._dead, self._tail = generation, offset, videos, 0, tail
+            self._write_index()
+
+    def claim_update(self, update_id: int) -> bool:
+        return self._updates.add(update_id)
+
+    def release_update(self, update_id: int):
+        self._updates.discard(update_id)
+
+    def close(self):
+        with self._lock:
+            if self._tail and not self.readonly and self._fd is not None:
+                self._write_index()
+            self._unmap_index()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                # Closing the descriptor releases the writer's lock
+                os.close(self._lock_fd)
+                self._lock_fd = None
@@ -1,74 +1,111 @@
 import os
-import json
-import uuid
-from urllib.parse import quote
+import asyncio
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application
-import re
+from video_store import get_store
+from providers import match as match_provider, source_key, title_for
+from records import enrich, is_posted, mark_posted
+from ids import new_video_id
+from video_lookup import get_all_videos, get_video_info, get_video_json  # re-exported for existing callers
+from bot_runtime import create_runtime
+from outbound import PRIORITY_CHANNEL, send, send_concurrently
+from links import announce, extract_urls, is_valid_url
 
 # Environment variables
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 CHANNEL_ID = os.environ.get('CHANNEL_ID')  # @channel_username or -1001234567890
 WEBAPP_BASE_URL = os.environ.get('WEBAPP_BASE_URL', 'https://your-app.vercel.app')
 
-# Simple in-memory storage (in production, use a proper database)
-VIDEOS_STORE = {}
+# Shared video storage (backend configured through VIDEO_STORE_BACKEND / VIDEO_STORE_PATH)
+VIDEOS_STORE = get_store()
 
 class VideoProcessor:
     @staticmethod
     def is_valid_url(url: str) -> bool:
         """Basic URL validation"""
-        return url.startswith(('http://', 'https://')) and '.' in url
+        return is_valid_url(url)
     
     @staticmethod
     def extract_video_title(video_url: str) -> str:
         """Extract video title from URL"""
-        if 'youtube.com' in video_url or 'youtu.be' in video_url:
-            return "YouTube Video"
-        elif 'vimeo.com' in video_url:
-            return "Vimeo Video"
-        elif 'tiktok.com' in video_url:
-            return "TikTok Video"
-        elif 'instagram.com' in video_url:
-            return "Instagram Video"
-        else:
-            return "Video Content"
+        return title_for(match_provider(video_url))
     
     @staticmethod
-    def save_video(video_id: str, video_url: str, username: str = "Unknown"):
-        """Save video to storage"""
-        VIDEOS_STORE[video_id] = {
-            "id": video_id,
-            "url": video_url,
-            "added_by": username,
-            "title": VideoProcessor.extract_video_title(video_url)
-        }
+    def save_video(video_id: str, video_url: str, username: str = "Unknown") -> dict:
+        """Save video to storage, returning the existing record for a resubmitted video"""
+        return VideoProcessor.save_videos([video_id], [video_url], username)[0]
+    
+    @staticmethod
+    def save_videos(video_ids: list, video_urls: list, username: str = "Unknown") -> list:
+        """Save several videos in one store write, returning the stored record for each URL"""
+        created_at = int(time.time())
+        records = []
+        for video_id, video_url in zip(video_ids, video_urls):
+            found = match_provider(video_url)
+            record = {
+                "id": video_id,
+                "url": video_url,
+                "added_by": username,
+                "title": title_for(found),
+                "created_at": created_at,
+                "source_key": source_key(video_url, found),
+                "posted": False
+            }
+            # Render the watch page fragments once, at ingest
+            records.append(enrich(record, found))
+        return VIDEOS_STORE.add_videos(records)
+    
+    @staticmethod
+    def mark_posted(records: list, message):
+        """Note that the channel post announcing these videos was delivered"""
+        VIDEOS_STORE.save_many([mark_posted(record, getattr(message, 'message_id', None)) for record in records])
+
+def reply(update: Update, text: str, **kwargs):
+    """Reply to the user through the flood-limit scheduler"""
+    return send(update.effective_chat.id, lambda: update.message.reply_text(text, **kwargs))
 
 async def process_video_url(update: Update, context):
     """Process video URL and create channel post"""
     try:
-        video_url = update.message.text.strip()
-        
-        # Validate URL
-        if not VideoProcessor.is_valid_url(video_url):
-            await update.message.reply_text(
+        # Every URL in the message, taken from its entities when Telegram sent them
+        urls = extract_urls(update.message.text, update.message.to_dict().get('entities'))
+        if not urls:
+            await reply(
+                update,
                 "❌ Please send a valid video URL.\n"
                 "Example: https://www.youtube.com/watch?v=VIDEO_ID"
             )
             return
         
-        # Generate unique video ID
-        video_id = str(uuid.uuid4())
         username = update.effective_user.username or update.effective_user.first_name or "Unknown"
+        if len(urls) > 1:
+            await process_video_urls(update, context, urls, username)
+            return
         
-        # Save video info
-        VideoProcessor.save_video(video_id, video_url, username)
+        # Generate unique video ID
+        video_url = urls[0]
+        video_id = new_video_id()
+        
+        # Save video info; a resubmitted video keeps its original record
+        video_info = VideoProcessor.save_video(video_id, video_url, username)
+        if video_info['id'] != video_id and is_posted(video_info):
+            await reply(
+                update,
+                f"ℹ️ This video was already added!\n\n"
+                f"🆔 Video ID: `{video_info['id']}`\n"
+                f"🌐 Watch URL: {WEBAPP_BASE_URL}/watch/{video_info['id']}",
+                parse_mode='Markdown'
+            )
+            return
+        
+        # A resubmitted video whose channel post never went out is posted now
+        video_id = video_info['id']
         
         # Create webapp URL
         webapp_url = f"{WEBAPP_BASE_URL}/watch/{video_id}"
         
         # Get video title
-        video_title = VideoProcessor.extract_video_title(video_url)
+        video_title = video_info['title']
         
         # Create channel post
         post_message = (
@@ -81,29 +118,56 @@ async def process_video_url(update: Update, context):
             [InlineKeyboardButton("🎥 Watch Video", url=webapp_url)]
         ])
         
-        # Send to channel
-        await context.bot.send_message(
-            chat_id=CHANNEL_ID,
-            text=post_message,
-            reply_markup=keyboard
+        # Post to the channel and confirm to the user at the same time
+        channel_result, _ = await send_concurrently(
+            send(CHANNEL_ID, lambda: context.bot.send_message(
+                chat_id=CHANNEL_ID,
+                text=post_message,
+                reply_markup=keyboard
+            ), PRIORITY_CHANNEL),
+            reply(
+                update,
+                f"✅ Video added successfully!\n\n"
+                f"🆔 Video ID: `{video_id}`\n"
+                f"🔗 Original URL: {video_url}\n"
+                f"🌐 Watch URL: {webapp_url}\n\n"
+                f"It is being posted to the channel now.",
+                parse_mode='Markdown'
+            )
         )
         
-        # Confirm to user
-        await update.message.reply_text(
-            f"✅ Video added successfully!\n\n"
-            f"🆔 Video ID: `{video_id}`\n"
-            f"🔗 Original URL: {video_url}\n"
-            f"🌐 Watch URL: {webapp_url}\n\n"
-            f"The post has been created in the channel!",
-            parse_mode='Markdown'
-        )
+        # A failed confirmation is only logged; a failed channel post is reported to the user
+        if isinstance(channel_result, Exception):
+            raise channel_result
+        VideoProcessor.mark_posted([video_info], channel_result)
         
     except Exception as e:
         print(f"Error processing video: {e}")
-        await update.message.reply_text(
+        await reply(
+            update,
             "❌ An error occurred while processing your video. Please try again."
         )
 
+async def process_video_urls(update: Update, context, urls: list, username: str):
+    """Save several videos at once, announce them in combined channel posts and reply once"""
+    video_ids = [new_video_id() for _ in urls]
+    stored = VideoProcessor.save_videos(video_ids, urls, username)
+    
+    def post(text: str, rows):
+        return send(CHANNEL_ID, lambda: context.bot.send_message(
+            chat_id=CHANNEL_ID,
+            text=text,
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton(label, url=url) for label, url in row] for row in rows
+            ])
+        ), PRIORITY_CHANNEL)
+    
+    # A failed summary is only logged; a failed channel post is reported to the user
+    await announce(
+        stored, video_ids, WEBAPP_BASE_URL, post, VideoProcessor.mark_posted,
+        lambda text: reply(update, text, parse_mode='Markdown')
+    )
+
 async def start_command(update: Update, context):
     """Handle /start command"""
     welcome_message = (
@@ -132,34 +196,36 @@ async def help_command(update: Update, context):
     )
     await update.message.reply_text(help_message)
 
+def register_handlers(application):
+    """Add the bot's command and message handlers to an application"""
+    from telegram.ext import CommandHandler, MessageHandler, filters
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_video_url))
+
+# Application and event loop shared by every update handled by this process
+BOT_RUNTIME = create_runtime(BOT_TOKEN, setup=register_handlers)
+
 # Webhook handler for Vercel
 async def webhook_handler(request_data):
     """Handle incoming webhook from Telegram"""
+    update_id = request_data.get('update_id')
+    
+    # Telegram redelivers updates it thinks failed; handle each update_id once
+    if update_id is not None and not VIDEOS_STORE.claim_update(update_id):
+        return {"statusCode": 200, "body": "OK"}
+    
     try:
-        # Create application
-        application = Application.builder().token(BOT_TOKEN).build()
-        
-        # Add handlers
-        from telegram.ext import CommandHandler, MessageHandler, filters
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_video_url))
-        
-        # Process update
-        update = Update.de_json(request_data, application.bot)
-        await application.process_update(update)
+        # Process update on the shared, already initialized application
+        future = BOT_RUNTIME.submit(
+            lambda bot: BOT_RUNTIME.application.process_update(Update.de_json(request_data, bot))
+        )
+        await asyncio.wrap_future(future)
         
         return {"statusCode": 200, "body": "OK"}
         
     except Exception as e:
         print(f"Webhook error: {e}")
+        if update_id is not None:
+            VIDEOS_STORE.release_update(update_id)
         return {"statusCode": 500, "body": f"Error: {str(e)}"}
-
-# Export the video store for the web app
-def get_video_info(video_id: str):
-    """Get video information by ID"""
-    return VIDEOS_STORE.get(video_id)
-
-def get_all_videos():
-    """Get all videos"""
-    return VIDEOS_STORE
\ No newline at end of file
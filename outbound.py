@@ -0,0 +1,267 @@
+import os
+import asyncio
+import bisect
+import itertools
+import weakref
+from datetime import timedelta
+from typing import Awaitable, Callable, List, Optional
+
+# Upper bound on Bot API calls in flight per event loop
+TELEGRAM_MAX_CONCURRENCY = int(os.environ.get('TELEGRAM_MAX_CONCURRENCY', '8'))
+
+# Telegram's flood limits: about 30 messages/s overall, 1/s per private chat, 20/min per group or channel
+TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.environ.get('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_GROUP_RATE = float(os.environ.get('TELEGRAM_GROUP_RATE', str(20 / 60)))
+TELEGRAM_GROUP_BURST = float(os.environ.get('TELEGRAM_GROUP_BURST', '3'))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', '3'))  # RetryAfter retries per message
+
+# Lower sends first: channel posts go out ahead of replies to the user
+PRIORITY_CHANNEL = 0
+PRIORITY_REPLY = 1
+PRIORITY_NAMES = {PRIORITY_CHANNEL: 'channel', PRIORITY_REPLY: 'reply'}
+
+# Buckets of idle chats are dropped once this many chats are tracked
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    """Allows rate sends per second with bursts of up to capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """When the next token is available"""
+        self._refill(now)
+        return now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class WaitHistogram:
+    """Counts of queue waits in fixed millisecond buckets"""
+
+    BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> dict:
+        buckets = {f"le_{bound}ms": count for bound, count in zip(self.BOUNDS_MS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.total,
+            "avg_ms": self.sum_ms / self.total if self.total else 0.0,
+            "max_ms": self.max_ms,
+            "buckets": buckets
+        }
+
+def _is_group(chat_id) -> bool:
+    # Channels are addressed as @username or by negative IDs, like groups
+    return isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds Telegram asked us to wait, for a RetryAfter error"""
+    retry_after = getattr(error, 'retry_after', None)
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after) if retry_after is not None else None
+
+class _Send:
+    __slots__ = ('chat_id', 'call', 'priority', 'future', 'enqueued', 'attempts')
+
+    def __init__(self, chat_id, call: Callable[[], Awaitable], priority: int, future: asyncio.Future, enqueued: float):
+        self.chat_id = chat_id
+        self.call = call
+        self.priority = priority
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0
+
+class OutboundScheduler:
+    """Dispatches Bot API sends under Telegram's global and per-chat flood limits
+
+    Sends wait in one queue ordered by priority. The dispatcher starts the
+    first one whose chat has a token, so a rate-limited or RetryAfter-blocked
+    chat never holds up other chats. RetryAfter errors block only their chat
+    and the send is queued again.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        now = loop.time()
+        self._global = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE, now)
+        self._chats = {}
+        self._blocked = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(TELEGRAM_MAX_CONCURRENCY)
+        self._dispatcher = None
+        self.waits = {name: WaitHistogram() for name in PRIORITY_NAMES.values()}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.cancelled = 0
+
+    def submit(self, chat_id, call: Callable[[], Awaitable], priority: int = PRIORITY_REPLY) -> asyncio.Future:
+        """Queue call() to run when the chat and global limits allow; returns its future"""
+        send = _Send(chat_id, call, priority, self._loop.create_future(), self._loop.time())
+        self._enqueue(send)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = self._loop.create_task(self._dispatch())
+        return send.future
+
+    def _enqueue(self, send: _Send):
+        bisect.insort(self._queue, (send.priority, next(self._sequence), send))
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.full(now)}
+            if _is_group(chat_id):
+                bucket = TokenBucket(TELEGRAM_GROUP_RATE, TELEGRAM_GROUP_BURST, now)
+            else:
+                bucket = TokenBucket(TELEGRAM_CHAT_RATE, 1, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _drop_cancelled(self):
+        """Forget queued sends whose caller stopped waiting, so they never spend a token"""
+        queue = [item for item in self._queue if not item[2].future.cancelled()]
+        self.cancelled += len(self._queue) - len(queue)
+        self._queue = queue
+
+    def _next_ready(self, now: float):
+        """Index of the first queued send allowed to go now, and when to look again otherwise"""
+        wake_at = None
+        for index, (_, _, send) in enumerate(self._queue):
+            ready_at = max(self._blocked.get(send.chat_id, now), self._chat_bucket(send.chat_id, now).ready_at(now))
+            if ready_at <= now:
+                return index, None
+            wake_at = ready_at if wake_at is None else min(wake_at, ready_at)
+        return None, wake_at
+
+    async def _dispatch(self):
+        while self._queue:
+            self._wakeup.clear()
+            self._drop_cancelled()
+            if not self._queue:
+                break
+            now = self._loop.time()
+            index, wake_at = self._next_ready(now)
+            global_at = self._global.ready_at(now)
+            if index is not None and global_at <= now:
+                _, _, send = self._queue.pop(index)
+                self._global.take(now)
+                self._chat_bucket(send.chat_id, now).take(now)
+                self._blocked.pop(send.chat_id, None)
+                self.waits[PRIORITY_NAMES.get(send.priority, 'reply')].observe(now - send.enqueued)
+                self._loop.create_task(self._run(send))
+                continue
+            wake_at = global_at if index is not None else wake_at
+            try:
+                # New sends may be ready sooner than anything already queued
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, wake_at - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, send: _Send):
+        async with self._in_flight:
+            if send.future.cancelled():
+                self.cancelled += 1
+                return
+            try:
+                result = await send.call()
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is not None and send.attempts < TELEGRAM_MAX_RETRIES:
+                    send.attempts += 1
+                    self.retries += 1
+                    print(f"Telegram flood limit for chat {send.chat_id}, retrying in {retry_after:.0f}s")
+                    self._blocked[send.chat_id] = max(
+                        self._blocked.get(send.chat_id, 0.0), self._loop.time() + retry_after
+                    )
+                    self._enqueue(send)
+                    if self._dispatcher is None or self._dispatcher.done():
+                        self._dispatcher = self._loop.create_task(self._dispatch())
+                    return
+                self.failed += 1
+                if not send.future.done():
+                    send.future.set_exception(e)
+                return
+        self.sent += 1
+        if not send.future.done():
+            send.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "cancelled": self.cancelled,
+            "blocked_chats": len(self._blocked),
+            "wait_ms": {name: histogram.snapshot() for name, histogram in self.waits.items()}
+        }
+
+_schedulers = weakref.WeakKeyDictionary()
+
+def get_scheduler() -> OutboundScheduler:
+    """Get the scheduler for the running loop"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = OutboundScheduler(loop)
+        _schedulers[loop] = scheduler
+    return scheduler
+
+async def send(chat_id, call: Callable[[], Awaitable], priority: int = PRIORITY_REPLY):
+    """Run a Bot API call for a chat through the flood-limit scheduler
+
+    call is a zero-argument function returning the coroutine, so the call can
+    be made again after a RetryAfter.
+    """
+    return await get_scheduler().submit(chat_id, call, priority)
+
+def outbound_stats() -> List[dict]:
+    """Scheduler statistics for every event loop in this process"""
+    return [scheduler.stats() for scheduler in list(_schedulers.values())]
+
+async def send_concurrently(*calls: Awaitable) -> List:
+    """Run independent Bot API calls at the same time
+
+    Each call succeeds or fails on its own: the result list holds either the
+    call's return value or the exception it raised, in argument order.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Outbound call failed: {result}")
+    return results
@@ -0,0 +1,194 @@
+"""Long-polling runner: an alternative to the webhook for self-hosted deployments
+
+Fetches updates with getUpdates and handles each batch concurrently through
+the webhook's process_message. Run it with `python poller.py`; the bot's
+webhook is removed on start, since Telegram refuses getUpdates while one is set.
+"""
+import os
+import sys
+import asyncio
+import signal
+import time
+from typing import Optional
+
+# process_message lives with the webhook handler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from webhook import BOT_TOKEN, VIDEOS_STORE, process_message
+from bot_runtime import TELEGRAM_BASE_URL
+from resilience import CircuitOpenError, Deadline, DeadlineExceeded, retry_after
+
+POLL_LIMIT = int(os.environ.get('POLL_LIMIT', '100'))  # Telegram returns at most 100 updates per call
+POLL_TIMEOUT = int(os.environ.get('POLL_TIMEOUT', '50'))  # seconds getUpdates waits for new updates
+POLL_CONCURRENCY = int(os.environ.get('POLL_CONCURRENCY', '16'))  # chats handled at the same time
+POLL_MAX_ATTEMPTS = int(os.environ.get('POLL_MAX_ATTEMPTS', '3'))  # tries before a failing update is skipped
+POLL_UPDATE_TIMEOUT = float(os.environ.get('POLL_UPDATE_TIMEOUT', '60'))  # seconds to handle one update, retries included
+POLL_REPORT_EVERY = float(os.environ.get('POLL_REPORT_EVERY', '30'))  # seconds between throughput reports
+POLL_ERROR_DELAY = 1.0
+
+class Poller:
+    """Fetches update batches and dispatches them with bounded parallelism
+
+    Updates of one chat are handled in order; different chats run
+    concurrently, at most `concurrency` at a time. The offset only moves past
+    an update once it and every update before it in the batch succeeded, so a
+    failure is fetched again; updates already finished are left alone when
+    the batch comes back, and counted once. An update is skipped after
+    POLL_MAX_ATTEMPTS failures, but not for failing while the Bot API is
+    down: those wait out the outage.
+    """
+
+    def __init__(self, bot, store=VIDEOS_STORE, concurrency: int = POLL_CONCURRENCY,
+                 limit: int = POLL_LIMIT, timeout: int = POLL_TIMEOUT,
+                 update_timeout: float = POLL_UPDATE_TIMEOUT):
+        self.bot = bot
+        self.store = store
+        self.concurrency = concurrency
+        self.limit = limit
+        self.timeout = timeout
+        self.update_timeout = update_timeout
+        self.offset = None
+        self.handled = 0
+        self.failed = 0
+        self.deferred = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.batches = 0
+        self._attempts = {}
+        # Updates finished but not committed yet, which a refetched batch carries again
+        self._finished = set()
+        self._semaphore = None
+        self._poll = None
+        self._stopping = False
+
+    async def handle(self, update) -> bool:
+        """Process one update; True once its offset can be committed"""
+        message = update.message
+        if message is None:
+            return True
+        if not self.store.claim_update(update.update_id):
+            self.duplicates += 1
+            return True
+        try:
+            await process_message(self.bot, message.to_dict(), deadline=Deadline(self.update_timeout))
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            # The Bot API is unreachable, which says nothing about the update itself
+            self.store.release_update(update.update_id)
+            print(f"Update {update.update_id} deferred until the Bot API recovers: {e}")
+            self.deferred += 1
+            return False
+        except Exception as e:
+            self.store.release_update(update.update_id)
+            attempts = self._attempts.pop(update.update_id, 0) + 1
+            if attempts >= POLL_MAX_ATTEMPTS:
+                print(f"Skipping update {update.update_id} after {attempts} attempts: {e}")
+                self.skipped += 1
+                self._finished.add(update.update_id)
+                return True
+            print(f"Update {update.update_id} failed, will retry: {e}")
+            self._attempts[update.update_id] = attempts
+            self.failed += 1
+            return False
+        self._attempts.pop(update.update_id, None)
+        self._finished.add(update.update_id)
+        self.handled += 1
+        return True
+
+    async def _handle_chat(self, updates: list, results: dict):
+        async with self._semaphore:
+            for update in updates:
+                if update.update_id in self._finished:
+                    results[update.update_id] = True
+                    continue
+                results[update.update_id] = await self.handle(update)
+                if not results[update.update_id]:
+                    # Keep the chat's order: later updates wait for the retry
+                    break
+
+    async def dispatch(self, updates: list) -> Optional[int]:
+        """Handle a batch and return the offset to commit"""
+        chats = {}
+        for update in updates:
+            chat = update.effective_chat
+            chats.setdefault(chat.id if chat else None, []).append(update)
+        results = {}
+        await asyncio.gather(*(self._handle_chat(group, results) for group in chats.values()))
+        offset = self.offset
+        for update in sorted(updates, key=lambda update: update.update_id):
+            if not results.get(update.update_id):
+                break
+            offset = update.update_id + 1
+        if offset is not None:
+            self._finished = {update_id for update_id in self._finished if update_id >= offset}
+        return offset
+
+    async def run(self, max_updates: Optional[int] = None):
+        """Poll until stop() is called, or until max_updates updates were handled"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        await self.bot.delete_webhook()
+        started = reported_at = time.monotonic()
+        reported = 0
+        while not self._stopping and (max_updates is None or self.handled < max_updates):
+            self._poll = asyncio.ensure_future(self.bot.get_updates(
+                offset=self.offset, limit=self.limit, timeout=self.timeout, allowed_updates=['message']
+            ))
+            try:
+                updates = await self._poll
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"getUpdates failed: {e}")
+                await asyncio.sleep(max(POLL_ERROR_DELAY, getattr(e, 'retry_after', 0) or 0))
+                continue
+            if updates:
+                self.batches += 1
+                self.offset = await self.dispatch(updates)
+                if self.offset != updates[-1].update_id + 1:
+                    # Something failed, most likely Telegram itself: give it time before refetching
+                    await asyncio.sleep(retry_after())
+            now = time.monotonic()
+            if now - reported_at >= POLL_REPORT_EVERY:
+                self.report(self.handled - reported, now - reported_at)
+                reported, reported_at = self.handled, now
+        self.report(self.handled, time.monotonic() - started, total=True)
+        if self.offset is not None:
+            # Confirm the committed offset so that a restart does not fetch these updates again
+            await self.bot.get_updates(offset=self.offset, limit=1, timeout=0)
+
+    def stop(self):
+        self._stopping = True
+        if self._poll is not None and not self._poll.done():
+            self._poll.cancel()
+
+    def report(self, handled: int, seconds: float, total: bool = False):
+        rate = handled / seconds if seconds > 0 else 0.0
+        print(f"{'Total' if total else 'Polling'}: {handled} updates in {seconds:.1f}s ({rate:.1f} updates/s), "
+              f"{self.failed} retried, {self.deferred} deferred, {self.skipped} skipped, offset {self.offset}")
+
+    def stats(self) -> dict:
+        return {
+            "offset": self.offset,
+            "handled": self.handled,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "batches": self.batches
+        }
+
+def create_bot(token: str = BOT_TOKEN, base_url: str = TELEGRAM_BASE_URL):
+    """A Bot on the process-wide transport"""
+    from telegram import Bot
+    from transport import get_requests
+    request, get_updates_request = get_requests()
+    return Bot(token=token, base_url=base_url, request=request, get_updates_request=get_updates_request)
+
+async def serve(bot, poller: Optional[Poller] = None):
+    poller = poller or Poller(bot)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, poller.stop)
+    async with bot:
+        await poller.run()
+
+if __name__ == '__main__':
+    asyncio.run(serve(create_bot()))
@@ -0,0 +1,208 @@
+from collections import namedtuple
+from html import escape
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import re
+from typing import Callable, Optional, Tuple
+
+# Structured result of matching a URL: provider name, provider video ID and how to embed it
+ProviderMatch = namedtuple('ProviderMatch', ['provider', 'id', 'embed_kind'])
+
+# Query parameters that never change which video a URL points to
+TRACKING_PARAMS = {'fbclid', 'gclid', 'igshid', 'si'}
+
+VIDEO_EXTENSIONS = {'.mp4', '.webm', '.ogg', '.mov', '.avi'}
+
+DEFAULT_TITLE = "Video Content"
+
+# Matches for URLs without a provider video ID
+FILE_MATCH = ProviderMatch('file', None, 'video')
+URL_MATCH = ProviderMatch('url', None, 'link')
+
+IFRAME_EMBED = '''
+            <div class="video-container">
+                <iframe width="100%" height="500"
+                        src="{src}"
+                        frameborder="0"
+                        allow="{allow}"
+                        allowfullscreen>
+                </iframe>
+            </div>'''
+
+VIDEO_EMBED = '''
+            <div class="video-container">
+                <video width="100%" height="500" controls autoplay>
+                    <source src="{url}" type="video/mp4">
+                    Your browser does not support the video tag.
+                </video>
+            </div>'''
+
+LINK_EMBED = '''
+        <div class="video-container">
+            <div class="fallback-message">
+                <h3>{title}</h3>
+                <p>Click the link below to watch {where}:</p>
+                <a href="{url}" target="_blank" class="video-link">{label}</a>
+            </div>
+        </div>'''
+
+IFRAME_ALLOW = "accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture"
+
+class Provider:
+    """A video site: the hosts it serves, how to find the video ID and how to embed it"""
+
+    def __init__(self, name: str, title: str, hosts, extract: Callable, embed_kind: str,
+                 player_url: str = '', allow: str = IFRAME_ALLOW, link_label: str = ''):
+        self.name = name
+        self.title = title
+        self.hosts = tuple(hosts)
+        self.extract = extract
+        self.embed_kind = embed_kind
+        self.player_url = player_url
+        self.allow = allow
+        self.link_label = link_label
+        self.no_id_match = ProviderMatch(name, None, 'link')
+
+# Registry: provider name -> provider, and hostname -> provider for dispatch
+PROVIDERS = {}
+_HOSTS = {}
+
+def register(provider: Provider):
+    """Add a provider; lookups stay a single dict access per URL"""
+    PROVIDERS[provider.name] = provider
+    for host in provider.hosts:
+        _HOSTS[host] = provider
+
+# Single pass split into host (minus www.), path and query; cheaper than urlsplit on the hot path
+URL_PARTS = re.compile(r'[^:/?#]+://(?:www\.)?([^/?#:@]*)[^/?#@]*([^?#]*)\??([^#]*)')
+
+def _parts(video_url: str) -> Tuple[str, str, str]:
+    parts = URL_PARTS.match(video_url)
+    if parts is None:
+        return '', '', ''
+    host, path, query = parts.groups()
+    if path[:1] == '@':
+        # Rare user@host URLs take the slow, exact route
+        split = urlsplit(video_url)
+        host = split.hostname or ''
+        host, path, query = host[4:] if host.startswith('www.') else host, split.path, split.query
+    return host.lower(), path, query
+
+# namedtuple's generated __new__ is slow; build matches directly on the hot path
+_new_match = tuple.__new__
+
+def _provider_for_host(host: str) -> Optional[Provider]:
+    """Find the provider for a subdomain like vm.tiktok.com through its parent domains"""
+    provider = None
+    while provider is None and host.count('.') > 1:
+        host = host.split('.', 1)[1]
+        provider = _HOSTS.get(host)
+    return provider
+
+YOUTUBE_PATH = re.compile(r'/(?:embed|shorts|live|v)/([A-Za-z0-9_-]+)')
+YOUTUBE_QUERY = re.compile(r'(?:^|&)v=([A-Za-z0-9_-]+)')
+YOUTUBE_SHORT_PATH = re.compile(r'/([A-Za-z0-9_-]+)')
+VIMEO_PATH = re.compile(r'/(?:video/)?(\d+)')
+TIKTOK_PATH = re.compile(r'/(?:.*/)?video/(\d+)')
+INSTAGRAM_PATH = re.compile(r'/(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+
+def _youtube_id(host: str, path: str, query: str) -> Optional[str]:
+    if host == 'youtu.be':
+        match = YOUTUBE_SHORT_PATH.match(path)
+    else:
+        match = YOUTUBE_PATH.match(path) or (YOUTUBE_QUERY.search(query) if path == '/watch' else None)
+    return match.group(1) if match else None
+
+def _pattern_id(pattern) -> Callable:
+    def extract(host: str, path: str, query: str) -> Optional[str]:
+        match = pattern.match(path)
+        return match.group(1) if match else None
+    return extract
+
+register(Provider(
+    'youtube', "YouTube Video",
+    ['youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com', 'youtu.be'],
+    _youtube_id, 'iframe', player_url="https://www.youtube.com/embed/{id}?autoplay=1"
+))
+register(Provider(
+    'vimeo', "Vimeo Video", ['vimeo.com', 'player.vimeo.com'],
+    _pattern_id(VIMEO_PATH), 'iframe', player_url="https://player.vimeo.com/video/{id}?autoplay=1",
+    allow="autoplay; fullscreen; picture-in-picture"
+))
+register(Provider(
+    'tiktok', "TikTok Video", ['tiktok.com'],
+    _pattern_id(TIKTOK_PATH), 'iframe', player_url="https://www.tiktok.com/embed/v2/{id}"
+))
+register(Provider(
+    'instagram', "Instagram Video", ['instagram.com'],
+    _pattern_id(INSTAGRAM_PATH), 'link', link_label="Instagram"
+))
+
+def _normalize(scheme: str, netloc: str, path: str, query: str) -> str:
+    """Generic URL key: lowercase scheme and host, no fragment, default port or tracking params"""
+    scheme = scheme.lower()
+    netloc = netloc.rsplit('@', 1)[-1].lower()
+    if scheme == 'http' and netloc.endswith(':80') or scheme == 'https' and netloc.endswith(':443'):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    ))
+    return urlunsplit((scheme, netloc, path.rstrip('/') or '/', query, ''))
+
+def match(video_url: str) -> ProviderMatch:
+    """Identify the provider, provider video ID and embed kind for a URL
+
+    The URL is parsed once and dispatched on its hostname, so only the
+    matching provider's precompiled extractor runs. The ID is None for URLs
+    that carry no provider video ID.
+    """
+    host, path, query = _parts(video_url.strip())
+    provider = _HOSTS.get(host) or _provider_for_host(host)
+    if provider is not None:
+        video_id = provider.extract(host, path, query)
+        if video_id:
+            return _new_match(ProviderMatch, (provider.name, video_id, provider.embed_kind))
+        return provider.no_id_match
+
+    dot = path.rfind('.')
+    if dot != -1 and path[dot:].lower() in VIDEO_EXTENSIONS:
+        return FILE_MATCH
+    return URL_MATCH
+
+def canonicalize(video_url: str, found: Optional[ProviderMatch] = None) -> Tuple[str, str]:
+    """Map a video URL to a (provider, provider_video_id) key
+
+    Known providers are keyed on their own video ID, so different URL forms of
+    the same video agree. Anything else is keyed on a normalized URL.
+    """
+    found = found or match(video_url)
+    if found.id is not None:
+        return found.provider, found.id
+    scheme, netloc, path, query, _ = urlsplit(video_url.strip())
+    return found.provider, _normalize(scheme, netloc, path, query)
+
+def source_key(video_url: str, found: Optional[ProviderMatch] = None) -> str:
+    """Canonical key used to detect resubmissions of the same video"""
+    provider, provider_video_id = canonicalize(video_url, found)
+    return f"{provider}:{provider_video_id}"
+
+def title_for(found: ProviderMatch) -> str:
+    """Display title for a matched URL"""
+    provider = PROVIDERS.get(found.provider)
+    return provider.title if provider else DEFAULT_TITLE
+
+def embed_html(video_url: str, video_title: str = "Video", found: Optional[ProviderMatch] = None) -> str:
+    """Generate embed code for a URL, reusing a previous match when given"""
+    found = found or match(video_url)
+    url = escape(video_url)
+    if found.embed_kind == 'iframe':
+        provider = PROVIDERS[found.provider]
+        return IFRAME_EMBED.format(src=provider.player_url.format(id=found.id), allow=provider.allow)
+    if found.embed_kind == 'video':
+        return VIDEO_EMBED.format(url=url)
+    provider = PROVIDERS.get(found.provider)
+    if provider is not None and provider.link_label:
+        where, label = f"on {provider.link_label}", f"Watch on {provider.link_label}"
+    else:
+        where, label = "the video", "Open Video"
+    return LINK_EMBED.format(title=escape(video_title), url=url, where=where, label=label)
@@ -0,0 +1,165 @@
+import uuid
+from array import array
+from typing import Dict, List, Optional, Union
+from ids import decode_base62, encode_base62, is_short_id
+from providers import DEFAULT_TITLE, PROVIDERS
+from records import ENRICHED_FIELDS, enrich, split_record
+
+class StringTable:
+    """Stores each distinct string once and refers to it by a small integer code"""
+
+    __slots__ = ('_codes', '_strings')
+
+    def __init__(self, strings=()):
+        self._codes = {}
+        self._strings = []
+        for string in strings:
+            self.code(string)
+
+    def code(self, string: str) -> int:
+        code = self._codes.get(string)
+        if code is None:
+            code = self._codes[string] = len(self._strings)
+            self._strings.append(string)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+# Titles come from a handful of provider constants, so they are enumerated up front
+TITLES = StringTable([DEFAULT_TITLE] + [provider.title for provider in PROVIDERS.values()])
+
+# Columns every compact row has; anything else a record carries is kept beside it
+BASE_FIELDS = ('id', 'url', 'added_by', 'title', 'created_at', 'source_key')
+
+def pack_id(video_id: str) -> Union[bytes, str]:
+    """Binary form of an ID: 8 bytes for short IDs, 16 for canonical UUIDs
+
+    Other IDs are kept as they are.
+    """
+    if is_short_id(video_id):
+        value = decode_base62(video_id)
+        if value < 1 << 64:
+            return value.to_bytes(8, 'big')
+        return video_id
+    if len(video_id) == 36:
+        try:
+            packed = uuid.UUID(video_id)
+        except ValueError:
+            return video_id
+        if str(packed) == video_id:
+            return packed.bytes
+    return video_id
+
+def unpack_id(key: Union[bytes, str]) -> str:
+    if isinstance(key, str):
+        return key
+    if len(key) == 8:
+        return encode_base62(int.from_bytes(key, 'big'))
+    return str(uuid.UUID(bytes=key))
+
+def _compactable(record: dict) -> bool:
+    return (isinstance(record.get('id'), str) and isinstance(record.get('url'), str)
+            and isinstance(record.get('added_by'), str) and isinstance(record.get('title'), str)
+            and type(record.get('created_at')) is int
+            and isinstance(record.get('source_key'), (str, type(None))))
+
+class RecordTable:
+    """Column-oriented storage for video records
+
+    Rows hold a binary ID, the URL, string-table codes for the username and
+    title and the creation time in typed arrays. The enriched fields are
+    derived from those, so they are not stored and are rendered again when a
+    row is read back as a dict.
+    """
+
+    def __init__(self):
+        self.usernames = StringTable()
+        self._ids = []
+        self._index = {}
+        self._urls = []
+        self._added_by = array('I')
+        self._titles = array('I')
+        self._created_at = array('q')
+        self._source_keys = []
+        # Row -> fields outside the columns, or the whole record, as given, when it does not fit them
+        self._extras = {}
+        self._whole = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def row_of(self, video_id: str) -> Optional[int]:
+        return self._index.get(pack_id(video_id))
+
+    def id_at(self, row: int) -> str:
+        return unpack_id(self._ids[row])
+
+    def append(self, record: dict) -> int:
+        """Add a record as a new row and return the row number"""
+        row = len(self._ids)
+        key = pack_id(record['id'])
+        self._ids.append(key)
+        self._index[key] = row
+        self._urls.append(None)
+        self._added_by.append(0)
+        self._titles.append(0)
+        self._created_at.append(0)
+        self._source_keys.append(None)
+        self.update(row, record)
+        return row
+
+    def update(self, row: int, record: dict):
+        """Overwrite a row with a newer version of its record"""
+        self._extras.pop(row, None)
+        self._whole.pop(row, None)
+        if not _compactable(record):
+            self._whole[row] = dict(record)
+            return
+        self._urls[row] = record['url']
+        self._added_by[row] = self.usernames.code(record['added_by'])
+        self._titles[row] = TITLES.code(record['title'])
+        self._created_at[row] = record['created_at']
+        self._source_keys[row] = record.get('source_key')
+        extras = {field: value for field, value in record.items()
+                  if field not in BASE_FIELDS and field not in ENRICHED_FIELDS}
+        if extras:
+            self._extras[row] = extras
+
+    def _fields(self, row: int) -> dict:
+        """A compact row's stored fields: everything but the enriched ones"""
+        record = {
+            "id": unpack_id(self._ids[row]),
+            "url": self._urls[row],
+            "added_by": self.usernames[self._added_by[row]],
+            "title": TITLES[self._titles[row]],
+            "created_at": self._created_at[row]
+        }
+        if self._source_keys[row] is not None:
+            record["source_key"] = self._source_keys[row]
+        extras = self._extras.get(row)
+        if extras:
+            record.update(extras)
+        return record
+
+    def public(self, row: int) -> dict:
+        """Rebuild a row's record without its private fields, as the API serves it"""
+        whole = self._whole.get(row)
+        return split_record(whole if whole is not None else self._fields(row))[0]
+
+    def record(self, row: int) -> dict:
+        """Rebuild the full record dict for a row, enriched fields included"""
+        whole = self._whole.get(row)
+        if whole is not None:
+            return dict(whole)
+        return enrich(self._fields(row))
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Public records of a range of rows"""
+        return [self.public(row) for row in range(start, len(self._ids) if stop is None else min(stop, len(self._ids)))]
+
+    def all(self) -> Dict[str, dict]:
+        return {self.id_at(row): self.public(row) for row in range(len(self._ids))}
@@ -0,0 +1,110 @@
+from html import escape
+from typing import Optional, Tuple
+from providers import ProviderMatch, embed_html, match as match_provider
+import jsoncodec
+
+# Derived fields stored on each record at ingest so the watch page does no parsing
+ENRICHED_FIELDS = ('provider', 'provider_id', 'embed_html', 'info_html')
+# The bot's own bookkeeping: the dedup key and whether the channel post went out
+BOOKKEEPING_FIELDS = ('source_key', 'posted', 'post_message_id')
+# Stores keep both apart from the public fields, whose JSON the API serves as stored.
+# Public fields never change once a record is created, so HTTP caches of them stay valid.
+PRIVATE_FIELDS = ENRICHED_FIELDS + BOOKKEEPING_FIELDS
+_PRIVATE_KEYS = tuple(f'"{field}":'.encode() for field in PRIVATE_FIELDS)
+
+INFO_HTML = '''
+    <div class="video-info">
+        <h2>{title}</h2>
+        <div class="video-meta">
+            <div><strong>Added by:</strong> {added_by}</div>
+            <div><strong>Video ID:</strong> {id}</div>
+            <div><strong>Original URL:</strong> <a href="{url}" target="_blank">{short_url}</a></div>
+        </div>
+    </div>
+    '''
+
+def render_info(record: dict) -> str:
+    """Render the video details block shown under the player"""
+    url = record['url']
+    return INFO_HTML.format(
+        title=escape(record.get('title', 'Video Information')),
+        added_by=escape(record['added_by']),
+        id=escape(record['id']),
+        url=escape(url),
+        short_url=escape(url[:50]) + ('...' if len(url) > 50 else '')
+    )
+
+def enrich(record: dict, found: Optional[ProviderMatch] = None) -> dict:
+    """Add provider details and the pre-rendered page fragments to a record"""
+    found = found or match_provider(record['url'])
+    record['provider'] = found.provider
+    record['provider_id'] = found.id
+    record['embed_html'] = embed_html(record['url'], record.get('title', 'Video'), found)
+    record['info_html'] = render_info(record)
+    return record
+
+def is_enriched(record: dict) -> bool:
+    return all(field in record for field in ENRICHED_FIELDS)
+
+def ensure_enriched(record: Optional[dict], store=None) -> Optional[dict]:
+    """Backfill a record saved before ingest-time enrichment
+
+    The enriched record is written back when a store is given, so the work
+    happens once per record rather than on every view.
+    """
+    if record is None or is_enriched(record):
+        return record
+    record = enrich(dict(record))
+    if store is not None:
+        try:
+            store.save(record)
+        except Exception as e:
+            print(f"Error backfilling video {record['id']}: {e}")
+    return record
+
+def is_posted(record: dict) -> bool:
+    """Whether a record's channel post went out; records saved before the flag were posted"""
+    return record.get('posted', True)
+
+def mark_posted(record: dict, message_id: Optional[int]) -> dict:
+    """The record with its delivered channel post noted"""
+    return {**record, 'posted': True, 'post_message_id': message_id}
+
+def split_record(record: dict) -> Tuple[dict, dict]:
+    """(public fields, private fields) of a record"""
+    public = {field: value for field, value in record.items() if field not in PRIVATE_FIELDS}
+    private = {field: record[field] for field in PRIVATE_FIELDS if field in record}
+    return public, private
+
+def encode_record(record: dict) -> Tuple[bytes, Optional[bytes]]:
+    """Serialize a record for storage: (public JSON, private fields JSON or None)"""
+    public, private = split_record(record)
+    return jsoncodec.dumps(public), jsoncodec.dumps(private) if private else None
+
+def decode_record(data: bytes, private: Optional[bytes] = None) -> dict:
+    """Rebuild a full record from its stored public JSON and private fields"""
+    record = jsoncodec.loads(data)
+    if private:
+        record.update(jsoncodec.loads(private))
+    return record
+
+def has_private_fields(data: bytes) -> bool:
+    """Whether stored JSON still carries private fields, as older versions wrote it"""
+    return any(key in data for key in _PRIVATE_KEYS)
+
+def public_json(data: bytes) -> bytes:
+    """Public JSON of stored bytes, stripping private fields saved inline by older versions"""
+    if not has_private_fields(data):
+        return data
+    return jsoncodec.dumps(split_record(jsoncodec.loads(data))[0])
+
+def record_json(store, video_id: str) -> Tuple[Optional[dict], Optional[bytes]]:
+    """Get a record's public fields and their JSON bytes as serialized at write time
+
+    The private fields are stored apart, so they are never part of the
+    bytes. Returns (None, None) for unknown IDs.
+    """
+    body = store.get_json(video_id)
+    if body is None:
+        return None, None
+    return jsoncodec.loads(body), body
@@ -0,0 +1,242 @@
+import os
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+VERCEL_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vercel.json')
+
+def _max_duration(function: str = 'api/webhook.py', default: float = 30.0) -> float:
+    """maxDuration of a function in vercel.json (which carries // comments)"""
+    try:
+        with open(VERCEL_CONFIG) as config_file:
+            config = json.loads(re.sub(r'\s//[^\n]*', '', config_file.read()))
+        return float(config['functions'][function]['maxDuration'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return default
+
+# Time budget for one update: the function's maxDuration minus a margin to
+# answer Telegram and release the update before the platform kills us
+FUNCTION_MAX_DURATION = float(os.environ.get('FUNCTION_MAX_DURATION', '0')) or _max_duration()
+DEADLINE_MARGIN = float(os.environ.get('DEADLINE_MARGIN', '5'))
+REQUEST_BUDGET = float(os.environ.get('UPDATE_TIMEOUT', '0')) or FUNCTION_MAX_DURATION - DEADLINE_MARGIN
+
+# Retries of transient Bot API failures
+BOT_API_MAX_ATTEMPTS = int(os.environ.get('BOT_API_MAX_ATTEMPTS', '4'))
+BOT_API_ATTEMPT_TIMEOUT = float(os.environ.get('BOT_API_ATTEMPT_TIMEOUT', '8'))
+BOT_API_BACKOFF_BASE = float(os.environ.get('BOT_API_BACKOFF_BASE', '0.25'))
+BOT_API_BACKOFF_MAX = float(os.environ.get('BOT_API_BACKOFF_MAX', '4'))
+
+# Calls that must not be made twice: they are only retried when the request never left
+NON_IDEMPOTENT_ENDPOINTS = frozenset({'sendMessage'})
+
+# Circuit breaker: consecutive failures that open it, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', '30'))
+
+class DeadlineExceeded(Exception):
+    """The update's time budget ran out before the call could finish"""
+
+class CircuitOpenError(Exception):
+    """The endpoint's circuit is open; the call was not attempted"""
+
+class Deadline:
+    """Absolute point in time by which an update has to be handled"""
+
+    def __init__(self, seconds: float = REQUEST_BUDGET):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+class CircuitBreaker:
+    """Fails calls fast while an endpoint keeps failing
+
+    After CIRCUIT_FAILURE_THRESHOLD consecutive failures the circuit opens and
+    calls are refused. Once CIRCUIT_RESET_TIMEOUT has passed, a single trial
+    call is let through: success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial:
+                    print(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a trial call through (0 when not open)"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a Bot API endpoint"""
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+    return breaker
+
+def retry_after() -> int:
+    """Whole seconds a client should wait before trying again: until the first circuit half-opens"""
+    waits = [breaker.retry_after() for breaker in list(_breakers.values()) if breaker.opened_at is not None]
+    return max(1, math.ceil(min(waits))) if waits else 1
+
+def breaker_stats() -> dict:
+    return {endpoint: breaker.stats() for endpoint, breaker in list(_breakers.items())}
+
+def is_transient(error: Exception) -> bool:
+    """Whether a call failed because of the network or the API rather than the request
+
+    Network errors, timeouts and 5xx responses are transient. Bad requests and
+    permission errors are not, and RetryAfter is left to the outbound scheduler.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+    except ImportError:
+        return False
+    if isinstance(error, (RetryAfter, BadRequest)):
+        return False
+    return isinstance(error, NetworkError)
+
+def never_sent(error: Exception) -> bool:
+    """Whether a call failed while connecting, before any of the request was sent
+
+    python-telegram-bot raises the httpx error as the cause of its own.
+    """
+    try:
+        import httpx
+    except ImportError:
+        httpx = None
+    for cause in (error, error.__cause__):
+        if isinstance(cause, ConnectionRefusedError):
+            return True
+        if httpx is not None and isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+    return False
+
+def is_retryable(error: Exception, endpoint: str) -> bool:
+    """Whether a failed call may be made again
+
+    Read and write timeouts may come after the API acted on the request, so
+    non-idempotent calls such as sendMessage are only retried when the
+    connection failed.
+    """
+    if not is_transient(error):
+        return False
+    return endpoint not in NON_IDEMPOTENT_ENDPOINTS or never_sent(error)
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry number (1 for the first retry)"""
+    return random.uniform(0, min(BOT_API_BACKOFF_MAX, BOT_API_BACKOFF_BASE * 2 ** attempt))
+
+async def call_with_retry(endpoint: str, call: Callable[[], Awaitable], deadline: Optional[Deadline] = None):
+    """Make a Bot API call with retries, a circuit breaker and a deadline
+
+    Every attempt is cut off at the remaining budget, and no retry starts
+    unless its backoff fits in what is left.
+    """
+    breaker = get_breaker(endpoint)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} circuit is open")
+        timeout = BOT_API_ATTEMPT_TIMEOUT
+        if deadline is not None:
+            if deadline.expired:
+                raise DeadlineExceeded(f"No time left for {endpoint}")
+            timeout = min(timeout, deadline.remaining())
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+        except Exception as e:
+            if not is_transient(e):
+                # The API answered, so it is up even though this call failed
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if not is_retryable(e, endpoint):
+                # The request may have gone through; making it again could post twice
+                raise
+            attempt += 1
+            delay = backoff(attempt)
+            if attempt >= BOT_API_MAX_ATTEMPTS:
+                raise
+            if deadline is not None and delay >= deadline.remaining():
+                raise DeadlineExceeded(f"{endpoint} still failing when the budget ran out: {e!r}") from e
+            print(f"{endpoint} failed ({e!r}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def check_available(endpoint: str, deadline: Optional[Deadline] = None):
+    """Fail fast before a call is queued behind the flood limits
+
+    Raises CircuitOpenError while the endpoint's circuit is open and
+    DeadlineExceeded once the budget is spent, so no scheduler token goes to
+    a call that could not be made. A half-open circuit is left for the call
+    itself to try.
+    """
+    breaker = get_breaker(endpoint)
+    if breaker.state == 'open':
+        breaker.rejected += 1
+        raise CircuitOpenError(f"{endpoint} circuit is open")
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded(f"No time left for {endpoint}")
+
+def resilient(endpoint: str, call: Callable[[], Awaitable], deadline: Optional[Deadline] = None) -> Callable[[], Awaitable]:
+    """Wrap a call factory so that every invocation goes through call_with_retry"""
+    return lambda: call_with_retry(endpoint, call, deadline)
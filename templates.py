@@ -0,0 +1,249 @@
+import hashlib
+from html import escape
+from httpcache import make_etag
+from compression import precompress
+
+# Page shell shared by every front end; {title} and {content} mark the two slots
+BASE_TEMPLATE = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            color: #333;
+        }
+
+        .header {
+            background: rgba(255, 255, 255, 0.1);
+            backdrop-filter: blur(10px);
+            padding: 1rem 0;
+            border-bottom: 1px solid rgba(255, 255, 255, 0.2);
+        }
+
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 0 20px;
+        }
+
+        .header h1 {
+            color: white;
+            text-align: center;
+            font-size: 2rem;
+            margin-bottom: 0.5rem;
+        }
+
+        .header p {
+            color: rgba(255, 255, 255, 0.8);
+            text-align: center;
+        }
+
+        .main-content {
+            padding: 2rem 0;
+        }
+
+        .video-container {
+            background: white;
+            border-radius: 15px;
+            overflow: hidden;
+            box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
+            margin: 2rem auto;
+            max-width: 800px;
+        }
+
+        .video-container iframe,
+        .video-container video {
+            width: 100%;
+            height: 450px;
+            border: none;
+        }
+
+        .video-info {
+            padding: 1.5rem;
+            background: white;
+            border-radius: 15px;
+            margin: 1rem auto;
+            max-width: 800px;
+            box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
+        }
+
+        .video-info h2 {
+            color: #333;
+            margin-bottom: 1rem;
+            font-size: 1.5rem;
+        }
+
+        .video-meta {
+            display: flex;
+            gap: 2rem;
+            margin-top: 1rem;
+            font-size: 0.9rem;
+            color: #666;
+        }
+
+        .fallback-message {
+            padding: 3rem;
+            text-align: center;
+            background: #f8f9fa;
+        }
+
+        .video-link {
+            display: inline-block;
+            background: #667eea;
+            color: white;
+            padding: 12px 24px;
+            text-decoration: none;
+            border-radius: 25px;
+            margin-top: 1rem;
+            transition: background 0.3s ease;
+        }
+
+        .video-link:hover {
+            background: #5a67d8;
+        }
+
+        .error-container, .home-content {
+            background: white;
+            border-radius: 15px;
+            padding: 3rem;
+            text-align: center;
+            margin: 2rem auto;
+            max-width: 600px;
+            box-shadow: 0 20px 40px rgba(0, 0, 0, 0.1);
+        }
+
+        .error-container h2 {
+            color: #e53e3e;
+            margin-bottom: 1rem;
+        }
+
+        .home-content h2 {
+            color: #333;
+            margin-bottom: 1rem;
+        }
+
+        .home-content p {
+            color: #666;
+            line-height: 1.6;
+            margin-bottom: 1rem;
+        }
+
+        @media (max-width: 768px) {
+            .container {
+                padding: 0 15px;
+            }
+            
+            .header h1 {
+                font-size: 1.5rem;
+            }
+            
+            .video-container iframe,
+            .video-container video {
+                height: 250px;
+            }
+            
+            .video-meta {
+                flex-direction: column;
+                gap: 0.5rem;
+            }
+        }
+    </style>
+</head>
+<body>
+    <header class="header">
+        <div class="container">
+            <h1>🎬 Video Hosting Platform</h1>
+            <p>Your personal video streaming service</p>
+        </div>
+    </header>
+
+    <main class="main-content">
+        <div class="container">
+            {content}
+        </div>
+    </main>
+</body>
+</html>
+'''
+
+# Changes whenever the shell does, so cached pages rendered with an older shell are not served
+TEMPLATE_VERSION = hashlib.sha1(BASE_TEMPLATE.encode()).hexdigest()[:12]
+
+def _compile(template: str):
+    """Split the shell into pre-encoded chunks around the title and content slots"""
+    head, rest = template.split('{title}')
+    middle, footer = rest.split('{content}')
+    return head.encode(), middle.encode(), footer.encode()
+
+_HEAD, _MIDDLE, _FOOTER = _compile(BASE_TEMPLATE)
+
+def render_page(title: str, content: str) -> bytes:
+    """Assemble a full page from the static chunks, an escaped title and HTML content"""
+    return b''.join((_HEAD, escape(title).encode(), _MIDDLE, content.encode(), _FOOTER))
+
+HOME_CONTENT = '''
+                <div class="home-content">
+                    <h2>Welcome to Our Video Platform</h2>
+                    <p>This platform hosts videos shared through our Telegram bot. Each video gets its own unique viewing page with embedded player support for various video platforms.</p>
+                    <p>To add videos, use our Telegram bot by sending video URLs directly to the bot.</p>
+                    <p><strong>Supported platforms:</strong> YouTube, Vimeo, TikTok, Instagram, Direct video files, and more!</p>
+                </div>
+                '''
+
+VIDEO_NOT_FOUND_CONTENT = '''
+                    <div class="error-container">
+                        <h2>❌ Video Not Found</h2>
+                        <p>The video you're looking for doesn't exist or may have been removed.</p>
+                        <a href="/" class="video-link">← Back to Home</a>
+                    </div>
+                    '''
+
+PAGE_NOT_FOUND_CONTENT = '''
+                <div class="error-container">
+                    <h2>❌ Page Not Found</h2>
+                    <p>The page you're looking for doesn't exist.</p>
+                    <a href="/" class="video-link">← Back to Home</a>
+                </div>
+                '''
+
+# Static pages never change, so they are rendered once at import
+HOME_PAGE = render_page("Home - Video Hosting Platform", HOME_CONTENT)
+VIDEO_NOT_FOUND_PAGE = render_page("Video Not Found", VIDEO_NOT_FOUND_CONTENT)
+PAGE_NOT_FOUND_PAGE = render_page("Page Not Found", PAGE_NOT_FOUND_CONTENT)
+
+# ...and compressed once, in every supported encoding
+HOME_PAGE_VARIANTS = precompress(HOME_PAGE)
+VIDEO_NOT_FOUND_VARIANTS = precompress(VIDEO_NOT_FOUND_PAGE)
+PAGE_NOT_FOUND_VARIANTS = precompress(PAGE_NOT_FOUND_PAGE)
+
+def render_watch_page(video_info: dict) -> bytes:
+    """Render the watch page for a video from its pre-rendered fragments"""
+    return render_page(
+        f"{video_info.get('title', 'Video')} - Video Platform",
+        video_info['embed_html'] + video_info['info_html']
+    )
+
+def watch_page_etag(video_info: dict) -> str:
+    """ETag for a watch page, known without rendering it"""
+    return make_etag(TEMPLATE_VERSION, video_info['id'], video_info.get('created_at'))
+
+HOME_ETAG = make_etag(TEMPLATE_VERSION, HOME_CONTENT)
+
+def render_error_page(message: str) -> bytes:
+    """Render the server error page"""
+    return render_page(
+        "Server Error",
+        f'<div class="error-container"><h2>❌ Server Error</h2><p>{escape(message)}</p></div>'
+    )
@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ids
+from ids import (BASE62, MAX_NODE, MAX_SEQUENCE, SHORT_ID_LENGTH, ShortIdGenerator, decode_base62,
+                 encode_base62, id_timestamp, is_short_id)
+
+@pytest.mark.parametrize('value', [0, 1, 61, 62, 3843, 3844, 123456789, (1 << 63) - 1])
+def test_base62_round_trip(value):
+    encoded = encode_base62(value)
+    assert len(encoded) == SHORT_ID_LENGTH
+    assert decode_base62(encoded) == value
+
+def test_fixed_width_ids_sort_like_their_values():
+    values = [0, 9, 10, 35, 36, 61, 62, 1000, 1 << 40, (1 << 63) - 1]
+    assert sorted(encode_base62(value) for value in values) == [encode_base62(value) for value in values]
+    assert list(BASE62) == sorted(BASE62)
+
+def test_ids_are_ordered_and_unique():
+    generate = ShortIdGenerator(node=5)
+    made = [generate() for _ in range(MAX_SEQUENCE * 3)]
+    assert made == sorted(made)
+    assert len(set(made)) == len(made)
+    assert all(is_short_id(video_id) for video_id in made)
+
+def test_ids_stay_ordered_when_the_clock_goes_back(monkeypatch):
+    generate = ShortIdGenerator(node=5)
+    first = generate()
+    monkeypatch.setattr(ids.time, 'time', lambda: 1704067200.0)
+    assert generate() > first
+
+def test_ids_carry_their_creation_time():
+    before = time.time()
+    video_id = ShortIdGenerator(node=MAX_NODE)()
+    assert before - 0.001 <= id_timestamp(video_id) <= time.time()
+    assert id_timestamp('not-a-short-id') is None
+
+def test_threads_never_share_an_id():
+    generate = ShortIdGenerator(node=1)
+    made = []
+    def worker():
+        made.extend(generate() for _ in range(2000))
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(made)) == len(made) == 8000
+
+def test_nodes_are_checked():
+    with pytest.raises(ValueError):
+        ShortIdGenerator(node=MAX_NODE + 1)
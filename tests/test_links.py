@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import links
+from links import MAX_KEYBOARD_BUTTONS, MAX_MESSAGE_LENGTH, channel_posts, extract_urls, summary_message
+
+BASE_URL = 'https://example.vercel.app'
+
+def url_entity(text: str, url: str) -> dict:
+    """A url entity for url in text, with offsets in UTF-16 code units as Telegram sends them"""
+    before = text[:text.index(url)]
+    return {"type": "url", "offset": len(before.encode('utf-16-le')) // 2,
+            "length": len(url.encode('utf-16-le')) // 2}
+
+def video(n: int, title: str = 'YouTube Video') -> dict:
+    return {"id": f"video{n}", "title": title}
+
+def test_entity_offsets_count_utf16_code_units():
+    # 🎬 and 👍 are surrogate pairs: two UTF-16 code units each, one str character
+    text = '🎬 look https://youtu.be/aaaaaaaaaaa and 👍 https://vimeo.com/123'
+    entities = [url_entity(text, 'https://youtu.be/aaaaaaaaaaa'), url_entity(text, 'https://vimeo.com/123')]
+    assert entities[0]['offset'] == len('🎬 look ') + 1
+    assert extract_urls(text, entities) == ['https://youtu.be/aaaaaaaaaaa', 'https://vimeo.com/123']
+
+def test_text_links_and_urls_keep_message_order():
+    text = 'watch this and https://vimeo.com/123'
+    entities = [
+        {"type": "text_link", "offset": 6, "length": 4, "url": "https://youtu.be/aaaaaaaaaaa"},
+        {"type": "bold", "offset": 0, "length": 5},
+        url_entity(text, 'https://vimeo.com/123')
+    ]
+    assert extract_urls(text, entities) == ['https://youtu.be/aaaaaaaaaaa', 'https://vimeo.com/123']
+
+def test_bare_domains_get_a_scheme():
+    text = 'youtu.be/aaaaaaaaaaa'
+    assert extract_urls(text, [url_entity(text, text)]) == ['https://youtu.be/aaaaaaaaaaa']
+
+def test_repeats_are_dropped():
+    text = 'https://vimeo.com/1 https://vimeo.com/2 https://vimeo.com/1'
+    assert extract_urls(text) == ['https://vimeo.com/1', 'https://vimeo.com/2']
+    entities = [{"type": "text_link", "offset": 0, "length": 1, "url": "https://vimeo.com/1"}] * 2
+    assert extract_urls('ab', entities) == ['https://vimeo.com/1']
+
+def test_text_is_scanned_without_entities():
+    text = 'First (https://vimeo.com/1), then https://youtu.be/aaaaaaaaaaa. Done'
+    assert extract_urls(text) == ['https://vimeo.com/1', 'https://youtu.be/aaaaaaaaaaa']
+    assert extract_urls('no links here', []) == []
+    assert extract_urls(' '.join(f'https://vimeo.com/{n}' for n in range(10)), limit=3) == [
+        'https://vimeo.com/0', 'https://vimeo.com/1', 'https://vimeo.com/2'
+    ]
+
+def test_single_video_post_is_worded_in_the_singular():
+    [(text, rows, records)] = channel_posts([video(1)], BASE_URL)
+    assert text.startswith('🎬 New Video Available!')
+    assert 'Click the button below' in text
+    assert rows == [[('🎥 1. YouTube Video', f'{BASE_URL}/watch/video1')]]
+    assert records == [video(1)]
+
+def test_posts_split_at_the_keyboard_limit(monkeypatch):
+    monkeypatch.setattr(links, 'KEYBOARD_ROW_SIZE', 3)
+    records = [video(n) for n in range(MAX_KEYBOARD_BUTTONS + 5)]
+    posts = channel_posts(records, BASE_URL)
+    assert [len(announced) for _, _, announced in posts] == [MAX_KEYBOARD_BUTTONS, 5]
+    text, rows, _ = posts[0]
+    assert text.startswith(f'🎬 {MAX_KEYBOARD_BUTTONS} New Videos Available!')
+    assert all(len(row) <= 3 for row in rows)
+    assert sum(len(row) for row in rows) == MAX_KEYBOARD_BUTTONS
+    # Numbering carries on across posts
+    assert posts[1][1][0][0][0].startswith(f'🎥 {MAX_KEYBOARD_BUTTONS + 1}.')
+
+def test_posts_split_at_the_text_limit():
+    # Long titles of surrogate pairs, which Telegram counts twice
+    records = [video(n, '🎞' * 300) for n in range(20)]
+    posts = channel_posts(records, BASE_URL)
+    assert len(posts) > 1
+    assert [record for _, _, announced in posts for record in announced] == records
+    for text, rows, announced in posts:
+        assert len(text.encode('utf-16-le')) // 2 <= MAX_MESSAGE_LENGTH
+        assert sum(len(row) for row in rows) == len(announced)
+
+def test_summary_wording():
+    one = summary_message([video(1)], [video(2)], BASE_URL)
+    assert '✅ 1 video added' in one and 'ℹ️ 1 was already added' in one
+    assert f'🆔 `video1` {BASE_URL}/watch/video1' in one
+    several = summary_message([video(1), video(2)], [video(3), video(4)], BASE_URL)
+    assert '✅ 2 videos added' in several and 'ℹ️ 2 were already added' in several
+    assert 'already' not in summary_message([video(1)], [], BASE_URL)
+
+def test_summary_fits_one_message():
+    records = [video(n) for n in range(500)]
+    summary = summary_message(records, [], BASE_URL)
+    assert len(summary.encode('utf-16-le')) // 2 <= MAX_MESSAGE_LENGTH
+    assert summary.splitlines()[-1].startswith('…and ') and summary.endswith(' more')
@@ -0,0 +1,137 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import log_store
+from log_store import INDEX_NAME, LOCK_NAME, LOG_NAME, LogVideoStore
+from records import enrich
+
+def video(n: int, title: str = 'YouTube Video') -> dict:
+    return enrich({
+        "id": f"video{n}",
+        "url": f"https://www.youtube.com/watch?v={n:011d}",
+        "added_by": "curator",
+        "title": title,
+        "created_at": 1700000000 + n,
+        "source_key": f"youtube:{n:011d}"
+    })
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'log')
+
+def log_size(directory: str) -> int:
+    return os.path.getsize(os.path.join(directory, LOG_NAME))
+
+def test_fragments_are_kept_out_of_the_json(directory):
+    store = LogVideoStore(directory)
+    store.save(video(1))
+    assert b'embed_html' not in store.get_json('video1')
+    assert store.get('video1')['embed_html'] == video(1)['embed_html']
+    assert store.find_by_source('youtube:00000000001')['id'] == 'video1'
+    store.close()
+
+def test_writer_truncates_torn_tail(directory):
+    store = LogVideoStore(directory)
+    store.save_many([video(1), video(2)])
+    store.close()
+    size = log_size(directory)
+    with open(os.path.join(directory, LOG_NAME), 'ab') as log:
+        log.write(b'\x05\x00\x00')
+
+    store = LogVideoStore(directory)
+    assert log_size(directory) == size
+    assert len(store) == 2
+    store.save(video(3))
+    store.close()
+
+    store = LogVideoStore(directory)
+    assert [record['id'] for record in store.page()] == ['video1', 'video2', 'video3']
+    store.close()
+
+def test_reader_leaves_partial_append_alone(directory):
+    writer = LogVideoStore(directory)
+    writer.save(video(1))
+    size = log_size(directory)
+    writer.save(video(2))
+    path = os.path.join(directory, LOG_NAME)
+    with open(path, 'rb') as log:
+        complete = log.read()
+    # The writer is halfway through appending video2
+    os.truncate(path, size + (len(complete) - size) // 2)
+
+    reader = LogVideoStore(directory, readonly=True)
+    assert log_size(directory) == size + (len(complete) - size) // 2
+    assert reader.get('video2') is None
+    with open(path, 'wb') as log:
+        log.write(complete)
+    assert reader.get('video2')['id'] == 'video2'
+    reader.close()
+    writer.close()
+
+def test_reader_sees_later_writes(directory, monkeypatch):
+    monkeypatch.setattr(log_store, 'VIDEO_LOG_INDEX_EVERY', 4)
+    writer = LogVideoStore(directory)
+    writer.save(video(1))
+    reader = LogVideoStore(directory, readonly=True)
+    version = reader.version()
+
+    assert reader.get('video2') is None
+    writer.save(video(2))
+    assert reader.get_json('video2') == writer.get_json('video2')
+    assert reader.version() != version
+
+    # Enough records for the writer to replace the index under the reader
+    writer.save_many([video(n) for n in range(3, 10)])
+    assert reader.find_by_source('youtube:00000000009')['id'] == 'video9'
+    assert len(reader) == 9
+    assert [video_id for video_id, _ in reader.page_json()] == [f'video{n}' for n in range(1, 10)]
+    reader.close()
+    writer.close()
+
+def test_reader_never_writes(directory):
+    writer = LogVideoStore(directory)
+    writer.save(video(1))
+    # Records the writer has not indexed yet
+    os.remove(os.path.join(directory, INDEX_NAME))
+    reader = LogVideoStore(directory, readonly=True)
+    assert reader.get('video1')['id'] == 'video1'
+    with pytest.raises(RuntimeError):
+        reader.save(video(2))
+    reader.close()
+    assert sorted(os.listdir(directory)) == sorted([LOG_NAME, LOCK_NAME])
+    writer.close()
+
+def test_single_writer(directory):
+    writer = LogVideoStore(directory)
+    with pytest.raises(RuntimeError):
+        LogVideoStore(directory)
+    writer.close()
+    LogVideoStore(directory).close()
+
+def test_compaction_keeps_latest_versions(directory):
+    writer = LogVideoStore(directory)
+    writer.save_many([video(n) for n in range(1, 6)])
+    for version in range(3):
+        writer.save_many([video(n, f"Title {version}") for n in range(1, 6)])
+    reader = LogVideoStore(directory, readonly=True)
+    size = log_size(directory)
+
+    writer.compact()
+    assert log_size(directory) < size
+    for store in (writer, reader):
+        assert len(store) == 5
+        assert [record['title'] for record in store.page()] == ['Title 2'] * 5
+        assert store.find_by_source('youtube:00000000003')['title'] == 'Title 2'
+
+    writer.save(video(6))
+    assert reader.get('video6')['id'] == 'video6'
+    writer.close()
+    reader.close()
+
+    store = LogVideoStore(directory)
+    assert len(store) == 6
+    assert store.get('video1')['title'] == 'Title 2'
+    store.close()
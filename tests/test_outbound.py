@@ -0,0 +1,121 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import outbound
+from outbound import PRIORITY_CHANNEL, OutboundScheduler, TokenBucket, send_concurrently
+
+def recorder(sent: list, label):
+    async def call():
+        sent.append(label)
+        return label
+    return call
+
+class FloodError(Exception):
+    """Stands in for telegram.error.RetryAfter"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+def test_cancelled_sends_are_not_sent_and_spend_no_token():
+    async def run():
+        scheduler = OutboundScheduler(asyncio.get_running_loop())
+        sent = []
+        first = scheduler.submit(1, recorder(sent, 'first'))
+        # Private chats get one send a second, so these wait for a token
+        given_up = scheduler.submit(1, recorder(sent, 'given up'))
+        waiting = scheduler.submit(1, recorder(sent, 'waiting'))
+        assert await first == 'first'
+        given_up.cancel()
+        assert await asyncio.wait_for(waiting, 3) == 'waiting'
+        return sent, scheduler.stats()
+    sent, stats = asyncio.run(run())
+    assert sent == ['first', 'waiting']
+    assert stats['cancelled'] == 1 and stats['sent'] == 2
+    assert stats['wait_ms']['reply']['max_ms'] < 1500
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, capacity=3, now=0)
+    for _ in range(3):
+        assert bucket.ready_at(0) == 0
+        bucket.take(0)
+    assert bucket.ready_at(0) == 0.5
+    assert bucket.ready_at(0.5) == 0.5
+    assert not bucket.full(1)
+    assert bucket.full(10) and bucket.tokens == 3
+
+def test_channel_posts_go_before_replies():
+    async def run():
+        scheduler = OutboundScheduler(asyncio.get_running_loop())
+        sent = []
+        futures = [
+            scheduler.submit(1, recorder(sent, 'reply 1')),
+            scheduler.submit(2, recorder(sent, 'reply 2')),
+            scheduler.submit('@channel', recorder(sent, 'post'), PRIORITY_CHANNEL)
+        ]
+        await asyncio.gather(*futures)
+        return sent
+    assert asyncio.run(run()) == ['post', 'reply 1', 'reply 2']
+
+def test_a_waiting_chat_does_not_hold_up_others(monkeypatch):
+    monkeypatch.setattr(outbound, 'TELEGRAM_CHAT_RATE', 10)
+    async def run():
+        scheduler = OutboundScheduler(asyncio.get_running_loop())
+        sent = []
+        futures = [
+            scheduler.submit(1, recorder(sent, 'chat 1 first')),
+            scheduler.submit(1, recorder(sent, 'chat 1 second')),
+            scheduler.submit(2, recorder(sent, 'chat 2'))
+        ]
+        await asyncio.wait_for(asyncio.gather(*futures), 3)
+        return sent
+    assert asyncio.run(run()) == ['chat 1 first', 'chat 2', 'chat 1 second']
+
+def test_retry_after_blocks_only_its_chat():
+    async def run():
+        scheduler = OutboundScheduler(asyncio.get_running_loop())
+        sent, attempts = [], []
+        async def flooded():
+            attempts.append(scheduler._loop.time())
+            if len(attempts) == 1:
+                raise FloodError(0.2)
+            sent.append('flooded')
+            return 'flooded'
+        flooded_send = scheduler.submit(1, flooded)
+        await asyncio.sleep(0.05)
+        assert await scheduler.submit(2, recorder(sent, 'other')) == 'other'
+        assert await asyncio.wait_for(flooded_send, 3) == 'flooded'
+        return sent, attempts, scheduler.stats()
+    sent, attempts, stats = asyncio.run(run())
+    assert sent == ['other', 'flooded']
+    assert attempts[1] - attempts[0] >= 0.2
+    assert stats['retries'] == 1 and stats['sent'] == 2 and stats['failed'] == 0
+
+def test_errors_reach_the_caller(monkeypatch):
+    monkeypatch.setattr(outbound, 'TELEGRAM_MAX_RETRIES', 1)
+    async def run():
+        scheduler = OutboundScheduler(asyncio.get_running_loop())
+        async def broken():
+            raise ValueError("Bad Request: chat not found")
+        async def flooded():
+            raise FloodError(0.01)
+        results = await asyncio.gather(
+            scheduler.submit(1, broken), scheduler.submit(2, flooded), return_exceptions=True
+        )
+        return results, scheduler.stats()
+    (broken, flooded), stats = asyncio.run(run())
+    assert isinstance(broken, ValueError) and isinstance(flooded, FloodError)
+    assert stats['failed'] == 2 and stats['retries'] == 1
+
+def test_send_concurrently_keeps_failures_in_place():
+    async def fails():
+        raise ValueError("boom")
+    async def run():
+        async def ok():
+            return 'ok'
+        return await send_concurrently(ok(), fails(), ok())
+    first, failure, last = asyncio.run(run())
+    assert (first, last) == ('ok', 'ok')
+    assert isinstance(failure, ValueError)
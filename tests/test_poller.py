@@ -0,0 +1,33 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import poller
+from poller import Poller
+from video_store import MemoryVideoStore
+
+def update(update_id: int, chat_id: int):
+    message = SimpleNamespace(to_dict=lambda: {"text": f"update {update_id}", "chat": {"id": chat_id}})
+    return SimpleNamespace(update_id=update_id, message=message, effective_chat=SimpleNamespace(id=chat_id))
+
+def test_refetched_updates_are_counted_once(monkeypatch):
+    processed = []
+    async def process_message(bot, message, deadline=None):
+        processed.append(message['text'])
+        if message['text'] == 'update 2' and processed.count('update 2') == 1:
+            raise ValueError("store unavailable")
+    monkeypatch.setattr(poller, 'process_message', process_message)
+    worker = Poller(bot=None, store=MemoryVideoStore())
+    worker._semaphore = asyncio.Semaphore(4)
+    batch = [update(1, 10), update(2, 20), update(3, 30)]
+
+    # update 2 fails, so the offset stays at it and the batch comes back
+    assert asyncio.run(worker.dispatch(batch)) == 2
+    assert worker.handled == 2
+    worker.offset = 2
+    assert asyncio.run(worker.dispatch(batch[1:])) == 4
+    assert processed == ['update 1', 'update 2', 'update 3', 'update 2']
+    assert worker.stats()['handled'] == 3
+    assert worker.duplicates == 0 and worker.failed == 1
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_store import LogVideoStore
+from providers import match, source_key
+from records import enrich
+from video_store import MemoryVideoStore, SQLiteVideoStore
+
+# URL -> the canonical key it has to map to
+SOURCE_KEYS = [
+    ('https://youtu.be/dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10', 'youtube:dQw4w9WgXcQ'),
+    ('https://m.youtube.com/watch?v=dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://www.youtube.com/watch?feature=share&v=dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://youtube.com/shorts/dQw4w9WgXcQ?si=abc', 'youtube:dQw4w9WgXcQ'),
+    ('https://www.youtube.com/embed/dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('HTTPS://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ', 'youtube:dQw4w9WgXcQ'),
+    ('https://vimeo.com/76979871', 'vimeo:76979871'),
+    ('https://player.vimeo.com/video/76979871?autoplay=1', 'vimeo:76979871'),
+    ('https://www.tiktok.com/@someone/video/7234567890123456789', 'tiktok:7234567890123456789'),
+    ('https://vm.tiktok.com/video/7234567890123456789', 'tiktok:7234567890123456789'),
+    ('https://www.instagram.com/reel/Cabc123_-/', 'instagram:Cabc123_-'),
+    ('https://Example.com:443/media/clip.mp4?utm_source=x#t=5', 'file:https://example.com/media/clip.mp4'),
+    ('https://example.com/media/clip.MP4', 'file:https://example.com/media/clip.MP4'),
+    ('https://example.com/page?b=2&a=1&fbclid=x', 'url:https://example.com/page?a=1&b=2'),
+    ('http://example.com:80', 'url:http://example.com/'),
+    ('https://www.youtube.com/feed/trending', 'youtube:https://www.youtube.com/feed/trending'),
+]
+
+@pytest.mark.parametrize('url, key', SOURCE_KEYS)
+def test_source_key(url, key):
+    assert source_key(url) == key
+
+@pytest.mark.parametrize('url, provider, embed_kind', [
+    ('https://youtu.be/dQw4w9WgXcQ', 'youtube', 'iframe'),
+    ('https://vimeo.com/76979871', 'vimeo', 'iframe'),
+    ('https://www.instagram.com/p/Cabc123/', 'instagram', 'link'),
+    ('https://example.com/clip.webm', 'file', 'video'),
+    ('https://example.com/watch', 'url', 'link'),
+    ('https://user@youtube.com/watch?v=dQw4w9WgXcQ', 'youtube', 'iframe'),
+])
+def test_match(url, provider, embed_kind):
+    found = match(url)
+    assert (found.provider, found.embed_kind) == (provider, embed_kind)
+
+def video(n: int, url: str) -> dict:
+    found = match(url)
+    return enrich({
+        "id": f"video{n}",
+        "url": url,
+        "added_by": "curator",
+        "title": "YouTube Video",
+        "created_at": 1700000000 + n,
+        "source_key": source_key(url, found)
+    }, found)
+
+@pytest.fixture(params=['memory', 'sqlite', 'log'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryVideoStore()
+    elif request.param == 'sqlite':
+        store = SQLiteVideoStore(str(tmp_path / 'videos.db'))
+    else:
+        store = LogVideoStore(str(tmp_path / 'log'))
+    yield store
+    store.close()
+
+def test_resubmissions_get_the_first_record(store):
+    urls = [url for url, key in SOURCE_KEYS if key == 'youtube:dQw4w9WgXcQ']
+    first = store.add_video(video(0, urls[0]))
+    assert first['id'] == 'video0'
+    stored = store.add_videos([video(n, url) for n, url in enumerate(urls[1:], 1)])
+    assert [record['id'] for record in stored] == ['video0'] * (len(urls) - 1)
+    assert len(store) == 1
+    assert store.find_by_source('youtube:dQw4w9WgXcQ')['url'] == urls[0]
+    assert store.find_by_source('vimeo:76979871') is None
+
+def test_one_batch_keeps_its_first_record_per_source(store):
+    stored = store.add_videos([
+        video(1, 'https://youtu.be/dQw4w9WgXcQ'),
+        video(2, 'https://vimeo.com/76979871'),
+        video(3, 'https://m.youtube.com/watch?v=dQw4w9WgXcQ')
+    ])
+    assert [record['id'] for record in stored] == ['video1', 'video2', 'video1']
+    assert len(store) == 2
@@ -0,0 +1,80 @@
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ids import encode_base62
+from record_table import RecordTable, StringTable, pack_id, unpack_id
+from records import PRIVATE_FIELDS, enrich
+
+def video(video_id: str, **fields) -> dict:
+    record = {
+        "id": video_id,
+        "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "added_by": "curator",
+        "title": "YouTube Video",
+        "created_at": 1700000000,
+        "source_key": "youtube:dQw4w9WgXcQ"
+    }
+    record.update(fields)
+    return enrich(record)
+
+def test_string_table_stores_each_string_once():
+    table = StringTable(['a', 'b'])
+    assert table.code('b') == 1
+    assert table.code('c') == 2
+    assert table.code('a') == 0
+    assert [table[code] for code in range(len(table))] == ['a', 'b', 'c']
+
+def test_ids_pack_and_unpack():
+    short = encode_base62(123456789)
+    canonical = str(uuid.uuid4())
+    assert len(pack_id(short)) == 8
+    assert len(pack_id(canonical)) == 16
+    for video_id in (short, canonical, 'legacy-id', canonical.upper(), encode_base62(1 << 70)):
+        assert unpack_id(pack_id(video_id)) == video_id
+    # Only the canonical UUID spelling is packed, so IDs come back exactly as given
+    assert pack_id(canonical.upper()) == canonical.upper()
+
+def test_rows_round_trip():
+    table = RecordTable()
+    records = [
+        video(encode_base62(1)),
+        video(str(uuid.uuid4()), title='Vimeo Video', url='https://vimeo.com/76979871',
+              source_key='vimeo:76979871'),
+        video('legacy-id', source_key=None, posted=False)
+    ]
+    for record in records:
+        table.append(record)
+    for row, record in enumerate(records):
+        assert table.row_of(record['id']) == row
+        assert table.id_at(row) == record['id']
+        assert table.record(row) == {field: value for field, value in record.items() if value is not None}
+    assert table.row_of('missing') is None
+
+def test_public_rows_leave_out_private_fields():
+    table = RecordTable()
+    table.append(video('video1', posted=True, post_message_id=7, note='kept'))
+    public = table.public(0)
+    assert not set(public) & set(PRIVATE_FIELDS)
+    assert public['note'] == 'kept'
+    assert table.records() == [public]
+    assert table.all() == {'video1': public}
+    assert table.record(0)['post_message_id'] == 7
+
+def test_records_that_do_not_fit_the_columns_are_kept_whole():
+    table = RecordTable()
+    odd = video('video1', created_at=1700000000.5)
+    table.append(odd)
+    assert table.record(0) == odd
+    assert table.public(0)['created_at'] == 1700000000.5
+
+def test_update_replaces_the_row():
+    table = RecordTable()
+    row = table.append(video('video1', created_at=1.5))
+    table.update(row, video('video1', added_by='someone', extra=1))
+    record = table.record(row)
+    assert record['added_by'] == 'someone' and record['created_at'] == 1700000000
+    table.update(row, video('video1'))
+    assert 'extra' not in table.record(row)
+    assert len(table) == 1
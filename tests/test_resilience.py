@@ -0,0 +1,117 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import resilience
+from resilience import (CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, call_with_retry,
+                        check_available, get_breaker, is_retryable, is_transient, never_sent)
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    monkeypatch.setattr(resilience, '_breakers', {})
+    monkeypatch.setattr(resilience, 'backoff', lambda attempt: 0.0)
+
+def failing(errors: list, result='ok'):
+    """A call factory that raises each of errors in turn, then returns result"""
+    calls = []
+    async def call():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    call.calls = calls
+    return call
+
+def caused_by(error: Exception, cause: Exception) -> Exception:
+    error.__cause__ = cause
+    return error
+
+def test_only_connection_failures_are_safe_to_resend():
+    refused = caused_by(ConnectionError('Connection refused'), ConnectionRefusedError())
+    reset = ConnectionResetError('Connection reset by peer')
+    assert never_sent(refused) and not never_sent(reset)
+    assert is_retryable(refused, 'sendMessage') and is_retryable(refused, 'getMe')
+    assert not is_retryable(reset, 'sendMessage') and is_retryable(reset, 'getMe')
+    assert not is_retryable(asyncio.TimeoutError(), 'sendMessage')
+    assert not is_transient(ValueError('Bad Request'))
+
+def test_telegram_errors():
+    error = pytest.importorskip('telegram.error')
+    httpx = pytest.importorskip('httpx')
+    connect = caused_by(error.NetworkError('httpx.ConnectError'), httpx.ConnectError('refused'))
+    read = caused_by(error.TimedOut(), httpx.ReadTimeout('timed out'))
+    assert is_retryable(connect, 'sendMessage')
+    assert is_transient(read) and not is_retryable(read, 'sendMessage') and is_retryable(read, 'getMe')
+    assert not is_transient(error.BadRequest('Chat not found'))
+    assert not is_transient(error.RetryAfter(5))
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker('test', threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    # A single trial call is let through
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+    assert breaker.stats()['rejected'] == 2
+
+def test_transient_failures_are_retried():
+    call = failing([ConnectionResetError(), asyncio.TimeoutError()])
+    assert asyncio.run(call_with_retry('getMe', call)) == 'ok'
+    assert len(call.calls) == 3
+    assert get_breaker('getMe').state == 'closed'
+
+def test_send_message_is_not_resent_after_a_timeout():
+    call = failing([asyncio.TimeoutError()])
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_retry('sendMessage', call))
+    assert len(call.calls) == 1
+
+def test_request_errors_are_raised_at_once():
+    call = failing([ValueError('Bad Request')] * 5)
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retry('getMe', call))
+    assert len(call.calls) == 1
+    assert get_breaker('getMe').failures == 0
+
+def test_attempts_are_capped(monkeypatch):
+    monkeypatch.setattr(resilience, 'BOT_API_MAX_ATTEMPTS', 3)
+    call = failing([ConnectionResetError()] * 10)
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(call_with_retry('getMe', call))
+    assert len(call.calls) == 3
+
+def test_open_circuit_fails_fast(monkeypatch):
+    monkeypatch.setattr(resilience, 'BOT_API_MAX_ATTEMPTS', 10)
+    breaker = get_breaker('getMe')
+    breaker.threshold = 2
+    call = failing([ConnectionResetError()] * 10)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_retry('getMe', call))
+    assert len(call.calls) == 2
+    with pytest.raises(CircuitOpenError):
+        check_available('getMe')
+    assert resilience.retry_after() >= 1
+
+def test_deadline_cuts_attempts_short():
+    async def slow():
+        await asyncio.sleep(5)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call_with_retry('getMe', slow, Deadline(0.1)))
+    assert time.monotonic() - started < 1
+    with pytest.raises(DeadlineExceeded):
+        check_available('getMe', Deadline(0))
+    check_available('getMe', Deadline(10))
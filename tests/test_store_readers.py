@@ -0,0 +1,63 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import video_lookup
+import video_store
+
+# Opens the log store for writing in its own process and holds it until stdin closes
+WRITER = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from log_store import LogVideoStore
+store = LogVideoStore(sys.argv[2])
+store.save({"id": "video1", "url": "https://youtu.be/dQw4w9WgXcQ", "added_by": "curator",
+            "title": "YouTube Video", "created_at": 1700000000, "source_key": "youtube:dQw4w9WgXcQ"})
+print("ready", flush=True)
+sys.stdin.read()
+store.close()
+'''
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'log')
+    process = subprocess.Popen([sys.executable, '-c', WRITER, ROOT, directory],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == 'ready'
+    monkeypatch.setattr(video_store, 'VIDEO_STORE_BACKEND', 'log')
+    monkeypatch.setattr(video_store, 'VIDEO_LOG_DIR', directory)
+    monkeypatch.setattr(video_store, '_store', None)
+    monkeypatch.setattr(video_store, '_reader', None)
+    video_lookup.VIDEO_JSON_CACHE.clear()
+    yield process
+    reader = video_store._reader
+    if reader is not None:
+        reader.close()
+    process.stdin.close()
+    process.wait(timeout=10)
+
+def test_writer_lock_is_held(writer):
+    with pytest.raises(RuntimeError):
+        video_store.get_store()
+
+def test_lookups_read_while_another_process_writes(writer):
+    assert video_store.get_reader().readonly
+    assert video_lookup.get_video_info('video1')['provider'] == 'youtube'
+    body, etag, _ = video_lookup.get_video_json('video1')
+    assert b'"id":"video1"' in body and etag
+    assert list(video_lookup.get_all_videos()) == ['video1']
+    assert video_lookup.get_video_info('missing') is None
+
+def test_app_imports_while_another_process_writes(writer):
+    pytest.importorskip('flask')
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+    client = app.app.test_client()
+    assert client.get('/api/video/video1').status_code == 200
+    assert client.get('/watch/video1').status_code == 200
+    assert client.get('/api/videos?limit=10').status_code == 200
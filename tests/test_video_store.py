@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_store import LogVideoStore
+from records import PRIVATE_FIELDS, enrich, mark_posted
+from video_store import MemoryVideoStore, SQLiteVideoStore
+
+def video(n: int) -> dict:
+    return enrich({
+        "id": f"video{n}",
+        "url": f"https://www.youtube.com/watch?v={n:011d}",
+        "added_by": "curator",
+        "title": "YouTube Video",
+        "created_at": 1700000000 + n,
+        "source_key": f"youtube:{n:011d}",
+        "posted": False
+    })
+
+@pytest.fixture(params=['memory', 'sqlite', 'log'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryVideoStore()
+    elif request.param == 'sqlite':
+        store = SQLiteVideoStore(str(tmp_path / 'videos.db'))
+    else:
+        store = LogVideoStore(str(tmp_path / 'log'))
+    yield store
+    store.close()
+
+def test_public_json_has_no_private_fields(store):
+    store.add_videos([video(1), video(2)])
+    for body in [store.get_json('video1')] + [data for _, data in store.page_json()]:
+        assert not set(json.loads(body)) & set(PRIVATE_FIELDS)
+    assert not set(store.all()['video2']) & set(PRIVATE_FIELDS)
+    record = store.get('video1')
+    assert record['embed_html'] and record['source_key'] == 'youtube:00000000001'
+    assert record['posted'] is False
+
+def test_marking_posted_leaves_the_public_json_alone(store):
+    store.add_video(video(1))
+    body, version = store.get_json('video1'), store.page_json()
+    store.save(mark_posted(store.get('video1'), 42))
+    assert store.get_json('video1') == body
+    assert store.page_json() == version
+    assert store.get('video1')['post_message_id'] == 42
+    assert store.find_by_source('youtube:00000000001')['posted'] is True
+
+def test_sqlite_moves_inline_private_fields_out(tmp_path):
+    path = str(tmp_path / 'videos.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE videos (seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE,"
+                 " created_at REAL NOT NULL, data TEXT NOT NULL)")
+    conn.execute("INSERT INTO videos (id, created_at, data) VALUES (?, ?, ?)",
+                 ('video1', 1700000001, json.dumps(video(1))))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteVideoStore(path)
+    assert not set(json.loads(store.get_json('video1'))) & set(PRIVATE_FIELDS)
+    assert store.get('video1') == video(1)
+    store.close()
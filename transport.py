@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+import httpx
+from telegram.request import HTTPXRequest
+
+# Connection pool of the process-wide Telegram client
+TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', os.environ.get('TELEGRAM_MAX_CONCURRENCY', '8')))
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.environ.get('TELEGRAM_KEEPALIVE_EXPIRY', '60'))  # seconds an idle connection is kept
+TELEGRAM_HTTP2 = os.environ.get('TELEGRAM_HTTP2', '0') == '1'  # needs the h2 package (httpx[http2])
+
+# Timeouts in seconds; the pool timeout is how long a call waits for a free connection
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.environ.get('TELEGRAM_READ_TIMEOUT', '5'))
+TELEGRAM_WRITE_TIMEOUT = float(os.environ.get('TELEGRAM_WRITE_TIMEOUT', '5'))
+TELEGRAM_POOL_TIMEOUT = float(os.environ.get('TELEGRAM_POOL_TIMEOUT', '1'))
+
+class TransportStats:
+    """Counts requests sent on reused connections versus new ones
+
+    Fed by httpcore's trace extension: a request whose connection went through
+    connect_tcp (and start_tls for HTTPS) paid for a new handshake.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.reused = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.connect_failures = 0
+        self.connect_seconds = 0.0
+        self.tls_seconds = 0.0
+
+    async def attach(self, request: httpx.Request):
+        """httpx request hook: trace this request's connection events"""
+        request.extensions['trace'] = self._tracer()
+
+    def _tracer(self):
+        started = {}
+        connected = False
+
+        async def trace(event: str, info: dict):
+            nonlocal connected
+            stage, _, phase = event.rpartition('.')
+            if phase == 'started':
+                started[stage] = time.perf_counter()
+                if stage.endswith('send_request_headers'):
+                    # httpcore may retry on a stale pooled connection, so count each send
+                    self.requests += 1
+                    if connected:
+                        connected = False
+                    else:
+                        self.reused += 1
+            elif phase == 'complete' and stage.endswith('connect_tcp'):
+                connected = True
+                self.new_connections += 1
+                self.connect_seconds += time.perf_counter() - started.get(stage, time.perf_counter())
+            elif phase == 'complete' and stage.endswith('start_tls'):
+                self.tls_handshakes += 1
+                self.tls_seconds += time.perf_counter() - started.get(stage, time.perf_counter())
+            elif phase == 'failed' and stage.endswith(('connect_tcp', 'start_tls')):
+                self.connect_failures += 1
+
+        return trace
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "reused": self.reused,
+            "new_connections": self.new_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "connect_failures": self.connect_failures,
+            "reuse_ratio": self.reused / self.requests if self.requests else 0.0,
+            "avg_connect_ms": self.connect_seconds * 1000 / self.new_connections if self.new_connections else 0.0,
+            "avg_tls_ms": self.tls_seconds * 1000 / self.tls_handshakes if self.tls_handshakes else 0.0,
+            "total_setup_ms": (self.connect_seconds + self.tls_seconds) * 1000
+        }
+
+class TracedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest with a keep-alive expiry and connection reuse counters"""
+
+    def __init__(self, stats: TransportStats, keepalive_expiry: float = TELEGRAM_KEEPALIVE_EXPIRY, **kwargs):
+        self.stats = stats
+        self.keepalive_expiry = keepalive_expiry
+        super().__init__(**kwargs)
+
+    def _build_client(self) -> httpx.AsyncClient:
+        # HTTPXRequest keeps every connection alive but has no setting for how long
+        limits = self._client_kwargs['limits']
+        return httpx.AsyncClient(**dict(
+            self._client_kwargs,
+            limits=httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            event_hooks={'request': [self.stats.attach]}
+        ))
+
+def create_request(stats: TransportStats, pool_size: int = TELEGRAM_POOL_SIZE,
+                   read_timeout: float = TELEGRAM_READ_TIMEOUT) -> TracedHTTPXRequest:
+    return TracedHTTPXRequest(
+        stats,
+        connection_pool_size=pool_size,
+        connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=read_timeout,
+        write_timeout=TELEGRAM_WRITE_TIMEOUT,
+        pool_timeout=TELEGRAM_POOL_TIMEOUT,
+        http_version='2' if TELEGRAM_HTTP2 else '1.1'
+    )
+
+TRANSPORT_STATS = TransportStats()
+_requests = None
+_requests_lock = threading.Lock()
+
+def get_requests() -> Tuple[TracedHTTPXRequest, TracedHTTPXRequest]:
+    """(request, get_updates_request) shared by every bot in this process
+
+    getUpdates long-polls, so it gets its own single connection and cannot
+    starve sends of the pool; both share one set of counters.
+    """
+    global _requests
+    if _requests is None:
+        with _requests_lock:
+            if _requests is None:
+                _requests = (create_request(TRANSPORT_STATS), create_request(TRANSPORT_STATS, pool_size=1))
+    return _requests
+
+def transport_stats() -> Optional[dict]:
+    """Connection reuse counters, or None before the first request object exists"""
+    if _requests is None:
+        return None
+    snapshot = TRANSPORT_STATS.snapshot()
+    snapshot.update(pool_size=TELEGRAM_POOL_SIZE, keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY, http2=TELEGRAM_HTTP2)
+    return snapshot
@@ -0,0 +1,39 @@
+import os
+from cache import TTLCache
+from httpcache import make_etag
+from records import ensure_enriched, record_json
+from video_store import get_reader
+
+# Read-only video lookups shared by the bot and the web entry points.
+# Only the store and stdlib are imported here, so read paths never load the Telegram stack.
+
+# Serialized /api/video responses; 404s are cached briefly
+VIDEO_JSON_CACHE = TTLCache(
+    maxsize=int(os.environ.get('VIDEO_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('VIDEO_CACHE_TTL', '300')),
+    negative_ttl=float(os.environ.get('VIDEO_CACHE_NEGATIVE_TTL', '10'))
+)
+
+def get_video_info(video_id: str):
+    """Get video information by ID"""
+    store = get_reader()
+    return ensure_enriched(store.get(video_id), None if store.readonly else store)
+
+def get_video_json(video_id: str):
+    """Get (JSON bytes, ETag, Last-Modified) for the video API, or None
+
+    The bytes are the ones stored at write time, so nothing is encoded per request.
+    """
+    entry = VIDEO_JSON_CACHE.get(video_id, default=False)
+    if entry is not False:
+        return entry
+    record, body = record_json(get_reader(), video_id)
+    if record is not None:
+        created_at = record.get('created_at')
+        entry = (body, make_etag('video', record['id'], created_at), created_at)
+    VIDEO_JSON_CACHE.set(video_id, entry)
+    return entry
+
+def get_all_videos():
+    """Get all videos"""
+    return get_reader().all()
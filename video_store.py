@@ -0,0 +1,496 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+from cache import TTLCache
+from dedup import RecentUpdates
+from record_table import RecordTable
+from records import decode_record, encode_record, has_private_fields, split_record
+import jsoncodec
+
+# Storage configuration
+VIDEO_STORE_BACKEND = os.environ.get('VIDEO_STORE_BACKEND', 'sqlite')  # sqlite, log or memory
+VIDEO_STORE_PATH = os.environ.get('VIDEO_STORE_PATH', '/tmp/videos.db')  # local disk only: WAL does not work over network filesystems
+VIDEO_LOG_DIR = os.environ.get('VIDEO_LOG_DIR', '/tmp/videos-log')  # directory of the log backend
+UPDATE_DEDUP_TTL = float(os.environ.get('UPDATE_DEDUP_TTL', '86400'))  # Telegram keeps undelivered updates for 24h
+RECORD_CACHE_SIZE = int(os.environ.get('RECORD_CACHE_SIZE', '1024'))  # hot records the memory backend keeps rendered
+
+class VideoStore:
+    """Interface implemented by every video storage backend"""
+
+    # Read-only stores reject every write, backfills included
+    readonly = False
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(record) for every record this process writes"""
+        self._listeners.append(callback)
+
+    def _notify(self, records: Iterable[dict]):
+        for record in records:
+            for callback in self._listeners:
+                try:
+                    callback(record)
+                except Exception as e:
+                    print(f"Video store listener error: {e}")
+
+    def get(self, video_id: str) -> Optional[dict]:
+        """Get a single video record by ID, private fields included"""
+        raise NotImplementedError
+
+    def get_json(self, video_id: str) -> Optional[bytes]:
+        """Get a record's public JSON exactly as serialized when it was written
+
+        The private fields (page fragments and bookkeeping) are stored apart
+        and never part of it.
+        """
+        raise NotImplementedError
+
+    def save(self, record: dict):
+        """Save a single video record"""
+        self.save_many([record])
+
+    def save_many(self, records: Iterable[dict]):
+        """Save several video records in one write"""
+        raise NotImplementedError
+
+    def add_video(self, record: dict) -> dict:
+        """Save a new record unless its source_key is already stored
+
+        Returns the stored record for that source: the new one, or the
+        existing one when the same video was submitted before.
+        """
+        return self.add_videos([record])[0]
+
+    def add_videos(self, records: List[dict]) -> List[dict]:
+        """Batch version of add_video, written in one transaction"""
+        raise NotImplementedError
+
+    def find_by_source(self, source_key: str) -> Optional[dict]:
+        """Get the record previously saved for a canonical source key"""
+        raise NotImplementedError
+
+    def all(self) -> Dict[str, dict]:
+        """Get the public fields of all video records keyed by ID, oldest first"""
+        raise NotImplementedError
+
+    def page(self, after: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Get the public fields of up to limit records added after the video with ID after, oldest first
+
+        Unknown cursors give an empty page.
+        """
+        return [jsoncodec.loads(data) for _, data in self.page_json(after, limit)]
+
+    def page_json(self, after: Optional[str] = None, limit: int = 100) -> List[Tuple[str, bytes]]:
+        """Like page, but (id, stored JSON) pairs that can be written out unparsed"""
+        raise NotImplementedError
+
+    def version(self) -> str:
+        """Cheap token that changes whenever a video is added"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def claim_update(self, update_id: int) -> bool:
+        """Mark a Telegram update as being processed; False for a redelivery"""
+        raise NotImplementedError
+
+    def release_update(self, update_id: int):
+        """Forget a claimed update so that Telegram's retry is processed"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the store"""
+
+class MemoryVideoStore(VideoStore):
+    """Per-process store, mainly for local development
+
+    Records are kept in a compact column table rather than as dicts. The
+    most recently read ones are also kept rendered, as their enriched dict
+    and public JSON, so hot videos are not rebuilt on every request.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._table = RecordTable()
+        # Source key -> row of the record first saved for it
+        self._sources = {}
+        self._updates = RecentUpdates()
+        self._lock = threading.Lock()
+        # Row -> (enriched record, public JSON); rows only change through _put, which drops them
+        self._rendered = TTLCache(maxsize=RECORD_CACHE_SIZE, ttl=float('inf'))
+
+    def _render(self, row: int) -> Tuple[dict, bytes]:
+        entry = self._rendered.get(row, default=None)
+        if entry is None:
+            # Render under the write lock so an update cannot be cached over with its old version
+            with self._lock:
+                record = self._table.record(row)
+                entry = (record, jsoncodec.dumps(split_record(record)[0]))
+                self._rendered.set(row, entry)
+        return entry
+
+    def _record(self, row: Optional[int]) -> Optional[dict]:
+        return None if row is None else dict(self._render(row)[0])
+
+    def get(self, video_id: str) -> Optional[dict]:
+        return self._record(self._table.row_of(video_id))
+
+    def get_json(self, video_id: str) -> Optional[bytes]:
+        row = self._table.row_of(video_id)
+        return None if row is None else self._render(row)[1]
+
+    def _put(self, record: dict) -> int:
+        row = self._table.row_of(record['id'])
+        if row is None:
+            return self._table.append(record)
+        self._table.update(row, record)
+        self._rendered.invalidate(row)
+        return row
+
+    def save_many(self, records: Iterable[dict]):
+        records = list(records)
+        with self._lock:
+            for record in records:
+                row = self._put(record)
+                if record.get('source_key'):
+                    self._sources.setdefault(record['source_key'], row)
+        self._notify(records)
+
+    def add_videos(self, records: List[dict]) -> List[dict]:
+        stored, added = [], []
+        with self._lock:
+            for record in records:
+                key = record.get('source_key')
+                row = self._sources.get(key) if key else None
+                if row is not None:
+                    stored.append(self._table.record(row))
+                    continue
+                row = self._put(record)
+                if key:
+                    self._sources[key] = row
+                stored.append(record)
+                added.append(record)
+        self._notify(added)
+        return stored
+
+    def find_by_source(self, source_key: str) -> Optional[dict]:
+        return self._record(self._sources.get(source_key))
+
+    def all(self) -> Dict[str, dict]:
+        return self._table.all()
+
+    def _start(self, after: Optional[str]) -> Optional[int]:
+        if after is None:
+            return 0
+        row = self._table.row_of(after)
+        return None if row is None else row + 1
+
+    def page(self, after: Optional[str] = None, limit: int = 100) -> List[dict]:
+        start = self._start(after)
+        return [] if start is None else self._table.records(start, start + limit)
+
+    def page_json(self, after: Optional[str] = None, limit: int = 100) -> List[Tuple[str, bytes]]:
+        return [(record['id'], jsoncodec.dumps(record)) for record in self.page(after, limit)]
+
+    def version(self) -> str:
+        count = len(self._table)
+        return f"{count}:{self._table.id_at(count - 1) if count else ''}"
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def claim_update(self, update_id: int) -> bool:
+        return self._updates.add(update_id)
+
+    def release_update(self, update_id: int):
+        self._updates.discard(update_id)
+
+class _ThreadConnection:
+    """Owns one thread's connection; freed with the thread's locals when the thread exits"""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+def _close_connection(connections: dict, lock: threading.Lock, key: int):
+    with lock:
+        conn = connections.pop(key, None)
+    if conn is not None:
+        conn.close()
+
+def _as_bytes(data) -> bytes:
+    # Rows are written as JSON bytes (BLOB); rows from older versions are TEXT
+    return data if isinstance(data, bytes) else data.encode()
+
+class SQLiteVideoStore(VideoStore):
+    """Embedded SQLite store in WAL mode, safe to share between processes on one host
+
+    The database must be on a local disk: WAL needs shared memory, which
+    network filesystems do not provide, so separate serverless instances each
+    have their own store.
+    """
+
+    # SQL is kept constant so sqlite3's statement cache reuses the prepared statements.
+    # data holds the public JSON; fragments the JSON of the private fields.
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS videos ("
+        " seq INTEGER PRIMARY KEY,"
+        " id TEXT NOT NULL UNIQUE,"
+        " created_at REAL NOT NULL,"
+        " data TEXT NOT NULL,"
+        " fragments BLOB)"
+    )
+    _UPDATES_SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS seen_updates ("
+        " update_id INTEGER PRIMARY KEY,"
+        " seen_at REAL NOT NULL)"
+    )
+    _SOURCES_SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS video_sources ("
+        " source_key TEXT PRIMARY KEY,"
+        " video_id TEXT NOT NULL)"
+    ) + " WITHOUT ROWID"
+    _SELECT_ONE = "SELECT data, fragments FROM videos WHERE id = ?"
+    _SELECT_ONE_JSON = "SELECT data FROM videos WHERE id = ?"
+    _SELECT_ALL = "SELECT id, data FROM videos ORDER BY seq"
+    _COUNT = "SELECT COUNT(*) FROM videos"
+    # Keyset pagination on the seq primary key; the cursor is resolved through the id index
+    _SELECT_FIRST_PAGE = "SELECT id, data FROM videos ORDER BY seq LIMIT ?"
+    _SELECT_PAGE = (
+        "SELECT id, data FROM videos"
+        " WHERE seq > (SELECT seq FROM videos WHERE id = ?)"
+        " ORDER BY seq LIMIT ?"
+    )
+    _VERSION = "SELECT COUNT(*), MAX(seq) FROM videos"
+    _INSERT = "INSERT OR IGNORE INTO videos (id, created_at, data, fragments) VALUES (?, ?, ?, ?)"
+    _UPDATE = "UPDATE videos SET data = ?, fragments = ? WHERE id = ?"
+    _SELECT_SOURCE = (
+        "SELECT videos.data, videos.fragments FROM video_sources"
+        " JOIN videos ON videos.id = video_sources.video_id"
+        " WHERE video_sources.source_key = ?"
+    )
+    _INSERT_SOURCE = "INSERT OR REPLACE INTO video_sources (source_key, video_id) VALUES (?, ?)"
+    _INDEX_SOURCE = "INSERT OR IGNORE INTO video_sources (source_key, video_id) VALUES (?, ?)"
+    _CLAIM_UPDATE = "INSERT OR IGNORE INTO seen_updates (update_id, seen_at) VALUES (?, ?)"
+    _RELEASE_UPDATE = "DELETE FROM seen_updates WHERE update_id = ?"
+    _PRUNE_UPDATES = "DELETE FROM seen_updates WHERE seen_at < ?"
+    _PRUNE_EVERY = 256
+    # PRAGMA user_version once private fields are out of data
+    _SCHEMA_VERSION = 1
+
+    def __init__(self, path: str = VIDEO_STORE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        # Open connections by owner id; each is closed when its thread exits
+        self._connections = {}
+        self._lock = threading.Lock()
+        # Redeliveries usually hit the same instance, so check memory before the database
+        self._recent_updates = RecentUpdates()
+        self._claims = 0
+        # Create the schema up front so readers never race the first writer
+        with self._connection() as conn:
+            conn.execute(self._SCHEMA)
+            conn.execute(self._UPDATES_SCHEMA)
+            conn.execute(self._SOURCES_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Move private fields that older versions stored inside data into their own column"""
+        conn = self._connection()
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self._SCHEMA_VERSION:
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while this one waited for the lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= self._SCHEMA_VERSION:
+                return
+            if not any(column[1] == 'fragments' for column in conn.execute("PRAGMA table_info(videos)")):
+                conn.execute("ALTER TABLE videos ADD COLUMN fragments BLOB")
+            rows = conn.execute("SELECT id, data, fragments FROM videos").fetchall()
+            conn.executemany(self._UPDATE, [
+                encode_record(decode_record(data, fragments)) + (video_id,)
+                for video_id, data, fragments in rows if has_private_fields(_as_bytes(data))
+            ])
+            conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        owner = getattr(self._local, 'owner', None)
+        if owner is not None:
+            return owner.conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        owner = _ThreadConnection(conn)
+        with self._lock:
+            self._connections[id(owner)] = conn
+        # Thread-per-request servers start a thread for every request, so
+        # connections must not outlive their thread
+        weakref.finalize(owner, _close_connection, self._connections, self._lock, id(owner))
+        self._local.owner = owner
+        return conn
+
+    def get(self, video_id: str) -> Optional[dict]:
+        row = self._connection().execute(self._SELECT_ONE, (video_id,)).fetchone()
+        return decode_record(*row) if row else None
+
+    def get_json(self, video_id: str) -> Optional[bytes]:
+        row = self._connection().execute(self._SELECT_ONE_JSON, (video_id,)).fetchone()
+        return _as_bytes(row[0]) if row else None
+
+    def save_many(self, records: Iterable[dict]):
+        records = list(records)
+        rows = [(record['id'], record.get('created_at', time.time())) + encode_record(record)
+                for record in records]
+        if not rows:
+            return
+        with self._connection() as conn:
+            inserted = conn.executemany(self._INSERT, rows).rowcount
+            # Only rewrite existing rows when some of the batch was already stored
+            if inserted != len(rows):
+                conn.executemany(self._UPDATE, [(data, fragments, video_id) for video_id, _, data, fragments in rows])
+            conn.executemany(self._INDEX_SOURCE, [
+                (record['source_key'], record['id']) for record in records if record.get('source_key')
+            ])
+        self._notify(records)
+
+    def add_videos(self, records: List[dict]) -> List[dict]:
+        stored = []
+        conn = self._connection()
+        with conn:
+            # Take the write lock first so concurrent submissions of one source serialize
+            conn.execute("BEGIN IMMEDIATE")
+            new_rows, new_sources, pending = [], [], {}
+            for record in records:
+                key = record.get('source_key')
+                if key in pending:
+                    stored.append(pending[key])
+                    continue
+                row = conn.execute(self._SELECT_SOURCE, (key,)).fetchone() if key else None
+                if row:
+                    stored.append(decode_record(*row))
+                    continue
+                new_rows.append((record['id'], record.get('created_at', time.time())) + encode_record(record))
+                if key:
+                    new_sources.append((key, record['id']))
+                    pending[key] = record
+                stored.append(record)
+            conn.executemany(self._INSERT, new_rows)
+            conn.executemany(self._INSERT_SOURCE, new_sources)
+        new_ids = {row[0] for row in new_rows}
+        self._notify(record for record in records if record['id'] in new_ids)
+        return stored
+
+    def find_by_source(self, source_key: str) -> Optional[dict]:
+        row = self._connection().execute(self._SELECT_SOURCE, (source_key,)).fetchone()
+        return decode_record(*row) if row else None
+
+    def all(self) -> Dict[str, dict]:
+        rows = self._connection().execute(self._SELECT_ALL)
+        return {video_id: jsoncodec.loads(data) for video_id, data in rows}
+
+    def page_json(self, after: Optional[str] = None, limit: int = 100) -> List[Tuple[str, bytes]]:
+        if after is None:
+            rows = self._connection().execute(self._SELECT_FIRST_PAGE, (limit,))
+        else:
+            rows = self._connection().execute(self._SELECT_PAGE, (after, limit))
+        return [(video_id, _as_bytes(data)) for video_id, data in rows]
+
+    def version(self) -> str:
+        count, last_seq = self._connection().execute(self._VERSION).fetchone()
+        return f"{count}:{last_seq or 0}"
+
+    def __len__(self) -> int:
+        return self._connection().execute(self._COUNT).fetchone()[0]
+
+    def claim_update(self, update_id: int) -> bool:
+        if update_id in self._recent_updates:
+            return False
+        now = time.time()
+        with self._connection() as conn:
+            claimed = conn.execute(self._CLAIM_UPDATE, (update_id, now)).rowcount == 1
+            self._claims += 1
+            if self._claims % self._PRUNE_EVERY == 0:
+                conn.execute(self._PRUNE_UPDATES, (now - UPDATE_DEDUP_TTL,))
+        self._recent_updates.add(update_id)
+        return claimed
+
+    def release_update(self, update_id: int):
+        self._recent_updates.discard(update_id)
+        with self._connection() as conn:
+            conn.execute(self._RELEASE_UPDATE, (update_id,))
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+def open_store(backend: Optional[str] = None, path: Optional[str] = None, readonly: bool = False) -> VideoStore:
+    """Create a store for the given backend name, VIDEO_STORE_BACKEND by default
+
+    readonly only changes the log backend, which allows a single writer:
+    processes that just serve pages open it read-only.
+    """
+    backend = backend or VIDEO_STORE_BACKEND
+    if backend == 'memory':
+        return MemoryVideoStore()
+    if backend == 'sqlite':
+        return SQLiteVideoStore(path or VIDEO_STORE_PATH)
+    if backend == 'log':
+        from log_store import LogVideoStore
+        return LogVideoStore(path or VIDEO_LOG_DIR, readonly=readonly)
+    raise ValueError(f"Unknown video store backend: {backend}")
+
+def store_available() -> bool:
+    """Whether this process can read the shared store directly
+
+    The memory backend only lives inside the bot process, and the SQLite
+    and log backends need files the bot has already created.
+    """
+    if VIDEO_STORE_BACKEND == 'log':
+        return os.path.exists(os.path.join(VIDEO_LOG_DIR, 'videos.log'))
+    return VIDEO_STORE_BACKEND == 'sqlite' and os.path.exists(VIDEO_STORE_PATH)
+
+_store = None
+_reader = None
+_store_lock = threading.Lock()
+
+def get_store() -> VideoStore:
+    """Get the process-wide store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store()
+    return _store
+
+def get_reader() -> VideoStore:
+    """Get the process-wide store for read-only paths
+
+    For the log backend this is a read-only store, so a process that only
+    serves pages never takes the bot's write lock; a process that already
+    opened the writable store reads through it. Other backends share
+    get_store().
+    """
+    global _reader
+    if VIDEO_STORE_BACKEND != 'log' or _store is not None:
+        return get_store()
+    if _reader is None:
+        with _store_lock:
+            if _reader is None:
+                _reader = open_store(readonly=True)
+    return _reader
@@ -0,0 +1,100 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+class WorkQueue:
+    """Bounded queue of updates processed in the background on a bot runtime
+
+    Webhook handlers submit work and return immediately; a fixed pool of
+    worker threads runs each item on the runtime's event loop. When the queue
+    is full, submit() refuses the item so the caller can push back on Telegram.
+    """
+
+    def __init__(self, runtime, maxsize: int = 100, workers: int = 4, timeout: Optional[float] = None):
+        self.runtime = runtime
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._accepting = True
+        self._lock = threading.Lock()
+        self._workers = []
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+        for index in range(workers):
+            worker = threading.Thread(target=self._work, name=f'update-worker-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func: Callable[..., Awaitable]) -> bool:
+        """Queue func(bot) for background processing; False when the queue is full"""
+        if self._accepting:
+            try:
+                self._queue.put_nowait((time.monotonic(), func))
+                return True
+            except queue.Full:
+                pass
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                enqueued_at, func = item
+                lag = time.monotonic() - enqueued_at
+                try:
+                    self.runtime.run(func, timeout=self.timeout)
+                    failed = False
+                except Exception as e:
+                    print(f"Background update error: {e}")
+                    failed = True
+                with self._lock:
+                    self.processed += 1
+                    self.failed += failed
+                    self.last_lag = lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self._total_lag += lag
+            finally:
+                self._queue.task_done()
+
+    def metrics(self) -> dict:
+        """Queue depth and processing lag (seconds between enqueue and start)"""
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "maxsize": self._queue.maxsize,
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "last_lag": self.last_lag,
+                "max_lag": self.max_lag,
+                "avg_lag": self._total_lag / self.processed if self.processed else 0.0
+            }
+
+    def drain(self, timeout: float = 10.0):
+        """Stop accepting work and wait for queued updates to finish"""
+        self._accepting = False
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            # Sentinels queue up behind pending work, so every item runs first
+            remaining = deadline - time.monotonic()
+            try:
+                self._queue.put(None, timeout=max(remaining, 0.01))
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+
+def create_work_queue(runtime, maxsize: int, workers: int, timeout: Optional[float] = None) -> WorkQueue:
+    """Create a work queue that is drained when the process exits"""
+    work_queue = WorkQueue(runtime, maxsize=maxsize, workers=workers, timeout=timeout)
+    atexit.register(work_queue.drain)
+    return work_queue